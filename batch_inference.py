@@ -0,0 +1,172 @@
+"""
+Batch KG-RAG inference over a BiomixQA split, pipelined in stages connected by bounded queues:
+
+    question embedding (micro-batches) -> retrieval (entity extraction, SPOKE, pruning) -> answer generation -> writer
+
+Retrieval of later questions overlaps answer generation of earlier ones. Records are appended to a JSONL file
+in input order as soon as they are done, in the format cot2kg consumes.
+"""
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+
+from tqdm import tqdm
+
+from config.config import config_mini
+from llm.openai_client import OpenAIClient
+from spoke.spoke_api_client import SpokeAPIClient
+from spoke.local_store import LocalSpokeStore
+from rag.rag import RAG
+from prompts.system_prompts import get_system_prompt
+from utils.schema_loader import load_task_schema
+from utils.dataset_loader import managed_load_dataset
+
+logger = logging.getLogger("retrieval_logger")
+logger.setLevel(logging.INFO)
+
+if not logger.handlers:
+    file_handler = logging.FileHandler("logs/retrieval.log")
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+
+_END = None     # end-of-stream marker passed between stages
+
+
+def _start_stage(worker_fn, in_q, out_q, n_workers):
+    """
+    Runs worker_fn(item) on n_workers threads, feeding results into out_q.
+    After the last worker sees the end marker, a single end marker is passed on to out_q.
+    """
+    remaining = [n_workers]
+    lock = threading.Lock()
+
+    def _loop():
+        while (item := in_q.get()) is not _END:
+            out_q.put(worker_fn(item))
+        in_q.put(_END)  # let sibling workers see it too
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                out_q.put(_END)
+
+    threads = [threading.Thread(target=_loop, daemon=True) for _ in range(n_workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _feed_embedded_questions(questions, embedding_function, batch_size, out_q):
+    """
+    Embeds questions in micro-batches and feeds (index, question, embedding) downstream
+    """
+    try:
+        for start in range(0, len(questions), batch_size):
+            batch = questions[start:start + batch_size]
+            embeddings = embedding_function.embed_documents([question["prompt"] for question in batch])
+            for offset, (question, embedding) in enumerate(zip(batch, embeddings)):
+                out_q.put((start + offset, question, embedding))
+    except Exception as e:
+        logger.info(f"Error occured while embedding questions: {e}")
+    finally:
+        # the downstream stages and the writer stop on the end marker - always send it
+        out_q.put(_END)
+
+
+def run(questions, output_path, rag, inference_client, retrieval_workers=4, generation_workers=4, embed_batch_size=32, queue_size=16):
+    system_prompt = get_system_prompt(task="mcq_question_cot_1")
+    text_data = load_task_schema(task="mcq_question_cot")
+
+    def _retrieve(item):
+        idx, question, question_embedding = item
+        try:
+            context, context_tables = rag.retrieve(question["prompt"], question_embedding=question_embedding)
+            return idx, question, context, context_tables
+        except Exception as e:
+            logger.info(f"Error occured: {question['question_id']} - {question['prompt']}: {e}")
+            return idx, question, None, None
+
+    def _generate(item):
+        idx, question, context, context_tables = item
+        if context is None:
+            return idx, None
+        try:
+            context_tuples = []
+            for context_table in context_tables:
+                context_tuples.extend(list(context_table[['source', 'predicate', 'target']].itertuples(index=False, name=None)))
+
+            enriched_prompt = "Context: "+ context + "\n" + "Question: "+ question["prompt"]
+            output = inference_client.generate_json_response(instructions=system_prompt, input_text=enriched_prompt, text_data=text_data)
+            return idx, {
+                "question_id": question["question_id"],
+                "question": question["prompt"],
+                "chain_of_thought": output["reasoning"],
+                "correct_answer": str(question["correct_answer"]).lower(),
+                "model_answer": output["answer"],
+                "kg_rag": context_tuples
+            }
+        except Exception as e:
+            logger.info(f"Error occured: {question['question_id']} - {question['prompt']}: {e}")
+            return idx, None
+
+    embedded_q = queue.Queue(maxsize=queue_size)
+    retrieved_q = queue.Queue(maxsize=queue_size)
+    generated_q = queue.Queue(maxsize=queue_size)
+
+    threading.Thread(
+        target=_feed_embedded_questions, args=(questions, rag.embedding_function, embed_batch_size, embedded_q), daemon=True
+    ).start()
+    _start_stage(_retrieve, embedded_q, retrieved_q, retrieval_workers)
+    _start_stage(_generate, retrieved_q, generated_q, generation_workers)
+
+    # writer - reorder buffer so the output follows input order
+    pending = {}
+    next_idx, n_written, n_failed = 0, 0, 0
+    start_time = time.time()
+    progress = tqdm(total=len(questions), desc="Processing questions")
+    with open(output_path, "a", encoding="utf-8") as f:
+        while (item := generated_q.get()) is not _END:
+            idx, record = item
+            pending[idx] = record
+            while next_idx in pending:
+                record = pending.pop(next_idx)
+                next_idx += 1
+                if record is None:
+                    n_failed += 1
+                    continue
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                n_written += 1
+            progress.update(1)
+    progress.close()
+    n_failed += len(questions) - next_idx     # never embedded (question embedding failed)
+
+    elapsed = time.time() - start_time
+    print(f"Wrote {n_written} records to {output_path} ({n_failed} failed) - {len(questions) / max(elapsed, 1e-9):.2f} questions/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipelined batch KG-RAG inference, writes JSONL for cot2kg")
+    parser.add_argument("--output_path", type=str, required=True, help="Path to output JSONL file (appended to)")
+    parser.add_argument("--split", choices=["mcq", "tf"], default="tf", help="BiomixQA split")
+    parser.add_argument("--data_len", type=int, default=None, help="Number of questions (default - all)")
+    parser.add_argument("--retrieval_workers", type=int, default=4)
+    parser.add_argument("--generation_workers", type=int, default=4)
+    parser.add_argument("--embed_batch_size", type=int, default=32, help="Questions embedded per micro-batch")
+    parser.add_argument("--queue_size", type=int, default=16, help="Max items waiting between two stages")
+    args = parser.parse_args()
+
+    extraction_client = OpenAIClient(config=config_mini)
+    inference_client = OpenAIClient(config=config_mini)
+    spoke_api_client = LocalSpokeStore() if config_mini.SPOKE_LOCAL_STORE_PATH else SpokeAPIClient()
+    rag = RAG(extraction_client, spoke_api_client, config_mini.CONTEXT_VOLUME, config_mini.QUESTION_VS_CONTEXT_SIMILARITY_PERCENTILE_THRESHOLD, config_mini.QUESTION_VS_CONTEXT_MINIMUM_SIMILARITY)
+
+    questions = managed_load_dataset(data_len=args.data_len)[args.split]
+    run(questions, args.output_path, rag, inference_client, args.retrieval_workers, args.generation_workers, args.embed_batch_size, args.queue_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Benchmark for the faithfulness scoring pipeline (faitheval.faithfulness.score_record).
+
+Records are synthetic and generated from a seed at configurable scales: RAG triples and CoT triples per record,
+graph density (average out-degree of a RAG entity) and the share of CoT triples with a negated relation.
+Embeddings come from a deterministic bag-of-tokens fake (no model download, no network), so runs are comparable
+across machines and commits.
+
+Reported per case: records/sec, per-stage wall time (structure prep, entity matching, path search, embedding,
+scoring - from faitheval.instrumentation), scoring counters and peak traced memory. Results are
+saved as JSON together with the git commit, and --compare prints the speedup against an earlier results file.
+
+Usage: python -m benchmarks.faitheval_bench --rag_triples 50 200 1000 --output_path bench.json [--compare old.json]
+"""
+import argparse
+import hashlib
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+
+import faitheval.faithfulness as faithfulness
+from faitheval import embedding_helpers
+from faitheval import instrumentation
+from faitheval.utils import normalization_cache_stats
+
+_WORDS = [
+    "skin", "atopic", "chronic", "arthritis", "psoriatic", "lung", "asthma", "allergic", "kidney", "renal", "failure",
+    "syndrome", "type", "acute", "cancer", "breast", "liver", "cirrhosis", "bowel", "inflammatory", "heart", "disorder",
+    "neuropathy", "diabetic", "juvenile", "retinal", "dystrophy", "muscular", "cell", "carcinoma"
+]
+_RELATIONS = ["ASSOCIATES", "ISA", "RESEMBLES", "LOCALIZES", "TREATS", "EXPRESSES", "DOWNREGULATES", "UPREGULATES"]
+
+
+class FakeEmbeddings:
+    """
+    Deterministic stand-in for the HuggingFace embedding function - a text embeds to the sum of fixed random
+    vectors of its tokens, so strings sharing tokens stay similar and fuzzy matching is exercised realistically
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._token_vectors = {}
+
+    def _token_vector(self, token):
+        if token not in self._token_vectors:
+            seed = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            self._token_vectors[token] = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return self._token_vectors[token]
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.split():
+            vector += self._token_vector(token)
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def generate_records(n_records, rag_triples, cot_triples, density, negative_ratio, seed=0):
+    """
+    Inputs:
+        n_records: int - number of records
+        rag_triples: int - RAG triples per record
+        cot_triples: int - CoT triples per record
+        density: float - average out-degree of a RAG entity (entities per record = rag_triples / density)
+        negative_ratio: float - share of CoT triples whose relation is negated
+        seed: int
+    Returns List[dict] in the evaluate input format ({"question_id", "question", "kg_rag", "cot_kg"})
+
+    Most CoT triples restate a RAG triple (type prefix dropped, tokens sometimes reordered or padded) or shortcut a
+    two-hop RAG path, so that exact, fuzzy and path matches all occur; the rest are random entity pairs.
+    """
+    rng = random.Random(seed)
+    n_entities = max(2, round(rag_triples / max(density, 1e-6)))
+    records = []
+    for q_id in range(n_records):
+        entities = []
+        for _ in range(n_entities):
+            if rng.random() < 0.2:
+                entities.append(f"Gene {rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')}{rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')}{rng.randint(1, 99)}")
+            else:
+                entities.append("Disease " + " ".join(rng.sample(_WORDS, rng.randint(1, 3))))
+
+        kg_rag = [[rng.choice(entities), rng.choice(_RELATIONS), rng.choice(entities)] for _ in range(rag_triples)]
+        out_edges = defaultdict(list)
+        for s, r, t in kg_rag:
+            out_edges[s].append((r, t))
+
+        cot_kg = []
+        for _ in range(cot_triples):
+            draw = rng.random()
+            if draw < 0.5:
+                s, r, t = rng.choice(kg_rag)
+            elif draw < 0.7:
+                s, r, middle = rng.choice(kg_rag)
+                t = rng.choice(out_edges[middle])[1] if out_edges[middle] else middle
+            else:
+                s, r, t = rng.choice(entities), rng.choice(_RELATIONS), rng.choice(entities)
+            s, t = s.replace("Disease ", "").replace("Gene ", ""), t.replace("Disease ", "").replace("Gene ", "")
+            if rng.random() < 0.3:
+                tokens = s.split()
+                rng.shuffle(tokens)
+                s = " ".join(tokens) + (" extra" if rng.random() < 0.3 else "")
+            if rng.random() < negative_ratio:
+                r = "does not " + r.lower()
+            cot_kg.append([s, r, t])
+
+        records.append({"question_id": q_id, "question": "synthetic", "kg_rag": kg_rag, "cot_kg": cot_kg})
+    return records
+
+
+def run_case(records, repeats=3, dim=384):
+    """
+    Scores all records `repeats` times, each repeat starting from empty embedding stores (cold, like a fresh run) -
+    the fake embedding function replaces the model, so the persistent embedding cache is not used
+
+    Returns dict with records/sec, per-stage seconds and counters (of the fastest repeat) and peak traced memory in MB
+    """
+    best = None
+    for _ in range(repeats):
+        embedding_helpers.set_embedding_fn(FakeEmbeddings(dim))
+        instrumentation.metrics.reset()
+        start = time.perf_counter()
+        for record in records:
+            faithfulness.score_record(record)
+        total = time.perf_counter() - start
+        if best is None or total < best[0]:
+            best = (total, instrumentation.metrics.summary())
+
+    # separate pass - tracemalloc slows allocation-heavy code down, so it is kept out of the timings
+    embedding_helpers.set_embedding_fn(FakeEmbeddings(dim))
+    tracemalloc.start()
+    for record in records:
+        faithfulness.score_record(record)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total, summary = best
+    stages = {stage: round(totals["seconds"], 4) for stage, totals in summary["stages"].items()}
+    stages["other"] = round(total - sum(totals["seconds"] for totals in summary["stages"].values()), 4)
+    return {
+        "total_s": round(total, 4),
+        "records_per_sec": round(len(records) / total, 2) if total else None,
+        "stages_s": stages,
+        "counters": summary["counters"],
+        "normalization_cache": normalization_cache_stats(),   # cumulative for the process, caches are shared across cases
+        "peak_memory_mb": round(peak / 2**20, 2),
+    }
+
+
+def _git_commit():
+    """
+    Returns (commit hash or None, whether the working tree has uncommitted changes)
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], check=True, capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], check=True, capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def _case_name(params):
+    return "rag{rag_triples}_cot{cot_triples}_d{density}_neg{negative_ratio}".format(**params)
+
+
+def _print_comparison(results, baseline_path):
+    baseline = json.load(open(baseline_path, "r", encoding="utf-8"))
+    print(f"\nCompared to {baseline_path} (commit {baseline.get('git_commit')}):")
+    for name, case in results["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if not old or not old.get("records_per_sec"):
+            print(f"{name:<40} not in baseline")
+            continue
+        print(f"{name:<40} {case['records_per_sec'] / old['records_per_sec']:.2f}x records/sec, "
+              f"peak memory {old['peak_memory_mb']} -> {case['peak_memory_mb']} MB")
+
+
+def main(args):
+    commit, dirty = _git_commit()
+    results = {
+        "git_commit": commit,
+        "git_dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "n_records": args.n_records,
+        "repeats": args.repeats,
+        "seed": args.seed,
+        "cases": {},
+    }
+
+    for rag_triples in args.rag_triples:
+        for cot_triples in args.cot_triples:
+            params = {"rag_triples": rag_triples, "cot_triples": cot_triples, "density": args.density, "negative_ratio": args.negative_ratio}
+            records = generate_records(args.n_records, seed=args.seed, **params)
+            case = run_case(records, args.repeats)
+            case["params"] = params
+            results["cases"][_case_name(params)] = case
+            stages = "  ".join(f"{stage} {seconds:.3f}s" for stage, seconds in case["stages_s"].items())
+            print(f"{_case_name(params):<40} {case['records_per_sec']:>9} rec/s  peak {case['peak_memory_mb']} MB  |  {stages}")
+
+    if args.output_path:
+        with open(args.output_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to: {args.output_path}")
+    if args.compare:
+        _print_comparison(results, args.compare)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faithfulness scoring benchmark on synthetic records")
+    parser.add_argument("--n_records", type=int, default=50, help="Records per case")
+    parser.add_argument("--rag_triples", type=int, nargs="+", default=[50, 200, 1000], help="RAG triples per record (one case per value)")
+    parser.add_argument("--cot_triples", type=int, nargs="+", default=[8], help="CoT triples per record (one case per value)")
+    parser.add_argument("--density", type=float, default=2.0, help="Average out-degree of a RAG entity")
+    parser.add_argument("--negative_ratio", type=float, default=0.2, help="Share of CoT triples with a negated relation")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed repeats per case (fastest is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output_path", type=str, default=None, help="Path to output JSON results file")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results JSON file to compare against")
+    main(parser.parse_args())
@@ -0,0 +1,65 @@
+"""
+Startup-time benchmark for the faitheval CLI.
+
+Each case runs in a fresh interpreter, so nothing is served from an already warm import. Also reports which
+heavy modules (sentence-transformers, torch, langchain, sklearn, ...) importing faitheval.faithfulness pulls in -
+with lazy loading that list should be empty until the first embedding cache miss.
+
+Usage: python -m benchmarks.startup [--repeats 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers", "langchain_huggingface", "langchain_chroma", "sklearn", "openai", "dotenv"]
+
+CASES = {
+    "import faitheval.faithfulness": [sys.executable, "-c", "import faitheval.faithfulness"],
+    "faitheval.evaluate --help": [sys.executable, "-m", "faitheval.evaluate", "--help"],
+}
+
+
+def _time_command(cmd, repeats):
+    """
+    Returns wall-clock seconds of each of `repeats` runs of cmd
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _loaded_heavy_modules():
+    """
+    Returns the HEAVY_MODULES that end up in sys.modules after importing faitheval.faithfulness in a fresh interpreter
+    """
+    code = (
+        "import sys, json, faitheval.faithfulness;"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(repeats):
+    results = {}
+    for name, cmd in CASES.items():
+        timings = _time_command(cmd, repeats)
+        results[name] = {"min_s": round(min(timings), 3), "median_s": round(statistics.median(timings), 3)}
+        print(f"{name:<35} min {min(timings):.3f}s  median {statistics.median(timings):.3f}s")
+
+    results["heavy_modules_after_import"] = _loaded_heavy_modules()
+    print("Heavy modules loaded by importing faitheval.faithfulness:", results["heavy_modules_after_import"] or "none")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="faitheval startup-time benchmark")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh-interpreter runs per case")
+    args = parser.parse_args()
+    main(args.repeats)
@@ -14,13 +14,20 @@ class Config:
 	)
 	VECTOR_DB_CHUNK_SIZE = int(os.getenv("VECTOR_DB_CHUNK_SIZE", 650))
 	VECTOR_DB_CHUNK_OVERLAP = int(os.getenv("VECTOR_DB_CHUNK_OVERLAP", 200))
-	VECTOR_DB_BATCH_SIZE = int(os.getenv("VECTOR_DB_BATCH_SIZE", 200))
+	VECTOR_DB_BATCH_SIZE = int(os.getenv("VECTOR_DB_BATCH_SIZE", 512)) # chunks per embedding task / Chroma write
+	VECTOR_DB_WORKERS = int(os.getenv("VECTOR_DB_WORKERS", 4)) # embedding processes for the build
 	VECTOR_DB_SENTENCE_EMBEDDING_MODEL = os.getenv(
 		"VECTOR_DB_SENTENCE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
 	)
 
 	# OpenAI config
 	OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+	OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") # None - default OpenAI endpoint; point at a local stub server for testing
+	LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+	LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 1.0))
+	# LLM response cache (shared by OpenAI and Groq clients)
+	LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite") # set to empty string to disable
+	LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 100000))
 	# Groq config
 	GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 	GROQ_MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "llama3-8b-8192")
@@ -37,6 +44,8 @@ class Config:
 	CONTEXT_VOLUME = int(os.getenv("CONTEXT_VOLUME", 150))
 	QUESTION_VS_CONTEXT_SIMILARITY_PERCENTILE_THRESHOLD = int(os.getenv("QUESTION_VS_CONTEXT_SIMILARITY_PERCENTILE_THRESHOLD", 75))
 	QUESTION_VS_CONTEXT_MINIMUM_SIMILARITY = float(os.getenv("QUESTION_VS_CONTEXT_MINIMUM_SIMILARITY", 0.5))
+	RAG_MAX_WORKERS = int(os.getenv("RAG_MAX_WORKERS", 4)) # nodes fetched and pruned in parallel per question
+	CONTEXT_EMBEDDING_CACHE_PATH = os.getenv("CONTEXT_EMBEDDING_CACHE_PATH", "data/context_embedding_cache") # set to empty string to disable
 
 	# SPOKE API config
 	BASE_URL = os.getenv("BASE_URL", "https://spoke.rbvi.ucsf.edu")
@@ -49,6 +58,19 @@ class Config:
 	CUTOFF_ACTEG_LEVEL = os.getenv("CUTOFF_ACTEG_LEVEL", "Low,Medium,High").split(',')
 	CUTOFF_DPL_AVERAGE_PREVALENCE = float(os.getenv("CUTOFF_DPL_AVERAGE_PREVALENCE", 0.001))
 	DEPTH = int(os.getenv("DEPTH", 1))
+	SPOKE_POOL_SIZE = int(os.getenv("SPOKE_POOL_SIZE", 10)) # keep-alive connections kept per host
+	SPOKE_CACHE_PATH = os.getenv("SPOKE_CACHE_PATH", "data/spoke_cache.sqlite") # neighborhood cache, set to empty string to disable
+	SPOKE_CACHE_TTL_SECONDS = float(os.getenv("SPOKE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+	SPOKE_CACHE_MAX_ENTRIES = int(os.getenv("SPOKE_CACHE_MAX_ENTRIES", 20000))
+	SPOKE_MAX_RETRIES = int(os.getenv("SPOKE_MAX_RETRIES", 3)) # retries on connection errors and 429/5xx responses
+	SPOKE_RETRY_BACKOFF = float(os.getenv("SPOKE_RETRY_BACKOFF", 0.5)) # seconds, doubled per retry
+	SPOKE_PREFETCH_WORKERS = int(os.getenv("SPOKE_PREFETCH_WORKERS", 8))
+	SPOKE_OFFLINE = os.getenv("SPOKE_OFFLINE", "false").lower() in ("1", "true", "yes") # serve only from SPOKE_CACHE_PATH, never call the API
+	SPOKE_LOCAL_STORE_PATH = os.getenv("SPOKE_LOCAL_STORE_PATH", "") # local SPOKE subgraph store (python -m spoke.local_store), used instead of the API when set
+
+	# Faithfulness evaluation config
+	EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache") # set to empty string to disable
+	EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200000))
  
 	def __init__(self, model_name: str = "gpt-4o-mini"):
 		self.MODEL_NAME = model_name
@@ -9,4 +9,8 @@ MAX_TOKENS = int(os.getenv("MAX_TOKENS", _global.MAX_TOKENS))
 
 BASE_DIR   = Path(__file__).resolve().parent.parent
 DATA_DIR   = BASE_DIR / "data"
-DEFAULT_OUTPUT_MODE = "compact" # otherwise "all"
\ No newline at end of file
+DEFAULT_OUTPUT_MODE = "compact" # otherwise "all"
+
+# async mode (--concurrency > 1)
+DEFAULT_CONCURRENCY = int(os.getenv("COT2KG_CONCURRENCY", 1))                 # max requests in flight, 1 - serial
+DEFAULT_REQUESTS_PER_SECOND = float(os.getenv("COT2KG_REQUESTS_PER_SECOND", 0)) # 0 - no rate limit
@@ -30,3 +30,13 @@ def cot_to_kg(chain_of_thought):
         input_text = chain_of_thought
     )
     return _extract_triples(raw)
+
+async def cot_to_kg_async(chain_of_thought, client):
+    """
+    Async version of cot_to_kg - client is an llm.openai_client.AsyncOpenAIClient
+    """
+    raw = await client.generate_response(
+        instructions = COT2KG_PROMPT.strip(),
+        input_text = chain_of_thought
+    )
+    return _extract_triples(raw)
@@ -4,6 +4,8 @@ from typing import Any
 
 def load_json(path: Path) -> Any:
     with path.open("r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            return [json.loads(line) for line in f if line.strip()]
         return json.load(f)
 
 def save_json(obj: Any, path: Path) -> None:
@@ -5,12 +5,16 @@ Modes:
 """
 
 import argparse
+import asyncio
 from pathlib import Path
 from tqdm import tqdm
 
 import cot2kg.convert_to_kg as convert_to_kg
 from cot2kg.io_utils import load_json, save_json
-from cot2kg.config import DEFAULT_OUTPUT_MODE
+from cot2kg.config import DEFAULT_OUTPUT_MODE, DEFAULT_CONCURRENCY, DEFAULT_REQUESTS_PER_SECOND
+from config.config import config_mini
+from llm.openai_client import AsyncOpenAIClient
+from llm.response_cache import get_response_cache
 
 _COMPACT_KEYS = ["question_id", "question", "correct_answer", "model_answer", "kg_rag"]
 
@@ -22,29 +26,60 @@ def _build_record(src: dict, kg: list, mode: str) -> dict:
         return src | {"cot_kg": kg}
     raise ValueError(f"Unknown mode {mode}")
 
+def _get_cot(rec: dict) -> str:
+    cot = rec.get("chain_of_thought")
+    if cot is None or "":
+        raise ValueError("Record missing 'chain_of_thought'")
+    return cot
+
 def _process(inp: Path, out: Path, mode: str):
     data = load_json(inp)
     out_data = []
 
     for rec in tqdm(data, desc="Processing records"):
-        cot = rec.get("chain_of_thought")
-        if cot is None or "":
-            raise ValueError("Record missing 'chain_of_thought'")
-        triples = convert_to_kg.cot_to_kg(cot)
+        triples = convert_to_kg.cot_to_kg(_get_cot(rec))
         out_data.append(_build_record(rec, triples, mode))
 
     save_json(out_data, out)
     print(f"Wrote {out}  ({len(out_data)} records, mode={mode})")
 
+async def _process_async(inp: Path, out: Path, mode: str, concurrency: int, rps: float):
+    data = load_json(inp)
+    client = AsyncOpenAIClient(config=config_mini, concurrency=concurrency, requests_per_second=rps)
+    progress = tqdm(total=len(data), desc="Processing records")
+
+    async def _convert(rec: dict) -> dict:
+        triples = await convert_to_kg.cot_to_kg_async(_get_cot(rec), client)
+        progress.update(1)
+        return _build_record(rec, triples, mode)
+
+    # gather keeps input order regardless of completion order
+    out_data = await asyncio.gather(*(_convert(rec) for rec in data))
+    progress.close()
+
+    save_json(out_data, out)
+    print(f"Wrote {out}  ({len(out_data)} records, mode={mode}, concurrency={concurrency})")
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--in",  dest="inp",  required=True)
     p.add_argument("--out", dest="out",  required=True)
     p.add_argument("--mode", choices=["all", "compact"],
                    default=DEFAULT_OUTPUT_MODE)
+    p.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                   help="max LLM requests in flight (asyncio mode if > 1)")
+    p.add_argument("--rps", type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                   help="max LLM requests started per second, 0 - unlimited")
     args = p.parse_args()
 
-    _process(Path(args.inp), Path(args.out), args.mode)
+    if args.concurrency > 1:
+        asyncio.run(_process_async(Path(args.inp), Path(args.out), args.mode, args.concurrency, args.rps))
+    else:
+        _process(Path(args.inp), Path(args.out), args.mode)
+
+    cache = get_response_cache()
+    if cache is not None:
+        print(f"LLM response cache: {cache.stats()}")
 
 if __name__ == "__main__":
     main()
@@ -22,6 +22,8 @@ ENTITY_TYPE_PREFIX_MAP = {
 }
 DEFAULT_ENTITY_TYPE = "other" # Default type if no prefix from ENTITY_TYPE_PREFIX_MAP matches
 
+NORMALIZATION_CACHE_SIZE = 65536   # simplified / typed strings memoized per process (LRU) - the same SPOKE names recur across records
+
 ######################################
 # Constants that depend on knowledge-graph - Update based on entities present and use case
 # RAG entities of these types will ONLY be matched exactly against a CoT entity - no fuzzy matching if exact match fails
@@ -0,0 +1,207 @@
+"""
+Persistent on-disk embedding cache, keyed by (embedding model name, text).
+
+Layout - one sub-directory per embedding model (embedding sizes differ between models):
+    vectors.f32 - memory-mapped float32 matrix, one row per slot
+    index.json  - embedding dim + [text, slot] pairs in least-recently-used first order
+    lock        - held (flock) by the one process that writes the cache
+
+The index on disk is only rewritten every _FLUSH_EVERY puts, so a slot freed by an eviction is not reused before
+the next flush - until then the index on disk may still map the evicted text to it. The vectors file keeps
+_FLUSH_EVERY rows of headroom beyond max_entries for these slots.
+
+A process that finds the lock held (e.g. a second evaluation run) only reads the cache, from a copy taken when it
+opens it - the writer may reuse slots meanwhile. Without fcntl (Windows) the lock is not taken.
+"""
+import atexit
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from faitheval.logging_config import logger
+
+_FLUSH_EVERY = 1000   # new entries written before index is persisted again
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, model_name, max_entries, readonly=False):
+        """
+        Inputs:
+            cache_dir: str | Path - root directory of the cache
+            model_name: str - embedding model name, entries of different models never mix
+            max_entries: int - size bound, least recently used entries are evicted beyond it
+            readonly: bool - only serve lookups, never write to disk (worker processes of the writer, which keeps the
+                files unchanged while they run)
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.readonly = readonly
+        self.dir = Path(cache_dir) / re.sub(r"[^\w.-]", "_", model_name)
+        self.vectors_path = self.dir / "vectors.f32"
+        self.index_path = self.dir / "index.json"
+        self.lock_path = self.dir / "lock"
+
+        self.dim = None
+        self._slots = OrderedDict()   # text -> slot, least recently used first
+        self._free_slots = []
+        self._pending_free = []      # evicted slots, reusable once the index on disk no longer refers to them
+        self._vectors = None
+        self._n_rows = 0
+        self._dirty = 0
+        self._touched = False        # recency changed by get/touch since the last flush
+        self._lock_file = None
+        self.hits = 0
+        self.misses = 0
+
+        snapshot = False
+        if not readonly and not self._acquire_lock():
+            logger.warning("Embedding cache at %s is in use by another process, opening it read-only", self.dir)
+            self.readonly = snapshot = True
+        self._load(snapshot)
+        if not self.readonly:
+            atexit.register(self.flush)
+
+    def _acquire_lock(self):
+        """
+        Takes the exclusive writer lock, held until the process exits - returns False if another process holds it
+        """
+        if fcntl is None:
+            return True
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            return False
+        return True
+
+    def _load(self, snapshot=False):
+        """
+        snapshot: bool - copy the vectors into memory instead of mapping them, retried until the index is unchanged
+            across the copy (a slot the index refers to is never reused before the index is replaced)
+        """
+        if not self.index_path.exists():
+            return
+        try:
+            for _ in range(5):
+                index_stat = os.stat(self.index_path)
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                self.dim = index["dim"]
+                self._slots = OrderedDict((text, slot) for text, slot in index["entries"])
+                self._n_rows = os.path.getsize(self.vectors_path) // (4 * self.dim)
+                if not snapshot:
+                    self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r" if self.readonly else "r+", shape=(self._n_rows, self.dim))
+                    break
+                self._vectors = np.fromfile(self.vectors_path, dtype=np.float32, count=self._n_rows * self.dim).reshape(self._n_rows, self.dim)
+                new_stat = os.stat(self.index_path)
+                if (new_stat.st_ino, new_stat.st_mtime_ns) == (index_stat.st_ino, index_stat.st_mtime_ns):
+                    break
+            else:
+                raise OSError("index kept changing while it was read")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Embedding cache at %s unreadable, starting empty: %s", self.dir, e)
+            self.dim, self._slots, self._vectors, self._n_rows = None, OrderedDict(), None, 0
+            return
+        used = set(self._slots.values())
+        self._free_slots = [slot for slot in range(self._n_rows) if slot not in used]
+        while len(self._slots) > max(self.max_entries, 0):
+            self._pending_free.append(self._slots.popitem(last=False)[1])
+            self._dirty += 1
+
+    def _grow(self, n_rows):
+        """
+        Extend vectors file to hold n_rows slots and re-map it
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if self._vectors is not None:
+            self._vectors.flush()
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(n_rows * self.dim * 4)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(n_rows, self.dim))
+        self._free_slots.extend(range(self._n_rows, n_rows))
+        self._n_rows = n_rows
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, text):
+        return text in self._slots
+
+    def get(self, text):
+        """
+        Returns np.ndarray (float32 copy) for text, or None if not cached
+        """
+        slot = self._slots.get(text)
+        if slot is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._slots.move_to_end(text)
+        self._touched = True
+        return np.array(self._vectors[slot])
+
+    def touch(self, texts):
+        """
+        Marks texts as recently used without reading them - e.g. cache hits reported by worker processes
+        """
+        for text in texts:
+            if text in self._slots:
+                self._slots.move_to_end(text)
+                self._touched = True
+
+    def put(self, text, embedding):
+        """
+        Stores embedding for text, evicting the least recently used entry if the cache is full
+        """
+        if self.readonly or self.max_entries <= 0:
+            return
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if self.dim is None:
+            self.dim = embedding.shape[0]
+        if text in self._slots:
+            slot = self._slots[text]
+            self._slots.move_to_end(text)
+        else:
+            if len(self._slots) >= self.max_entries:
+                self._pending_free.append(self._slots.popitem(last=False)[1])
+            if not self._free_slots:
+                max_rows = self.max_entries + _FLUSH_EVERY
+                if self._n_rows < max_rows:
+                    self._grow(min(max_rows, max(1024, 2 * self._n_rows)))
+                else:
+                    self.flush()    # releases the evicted slots
+            slot = self._free_slots.pop()
+            self._slots[text] = slot
+        self._vectors[slot] = embedding
+        self._dirty += 1
+        if self._dirty >= _FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """
+        Persist vectors and index - index is replaced atomically so a crash never leaves it half-written,
+        evicted slots become reusable only once it no longer refers to them
+        """
+        if self.readonly or not (self._dirty or self._touched or self._pending_free) or self._vectors is None:
+            return
+        self._vectors.flush()
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "entries": list(self._slots.items())}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = 0
+        self._touched = False
+        self._free_slots.extend(self._pending_free)
+        self._pending_free = []
@@ -1,15 +1,162 @@
 import numpy as np
-from rag.utils import get_embedding_function, get_text_embedding
-from config.config import config_mini as config
 
 from faitheval.utils import _simplify
+from faitheval.embedding_cache import EmbeddingCache
+from faitheval.instrumentation import increment, timer
 
 # using same embedding fn for all comparisons (entities, triples)...
-embedding_fn = get_embedding_function(model_name=config.EMBEDDING_MODEL_FOR_NODE_RETRIEVAL)
+# loaded on first use (see get_embedding_fn) - importing this module stays cheap, runs served from the disk cache never load the model
+_embedding_fn = None
 
 _entity_embd_store = {}     # dict[str] = np.ndarray
 _triple_embd_store = {}     # dict[(e1, r1, e2)] = np.ndarray
 
+# persistent across runs, keyed by (model name, simplified text) - in-process stores above are checked first
+_disk_cache = None
+_disk_cache_loaded = False
+
+# set in worker processes - disk cache is only read there, new embeddings and cache hits are handed back to the parent
+_collected_embeddings = None    # dict[str] = np.ndarray
+_collected_hits = None          # dict[str] = None, most recently used last
+
+
+def get_embedding_fn():
+    """
+    Returns the shared embedding function, loading the sentence-transformer (and rag.utils / langchain) on the first call
+    """
+    global _embedding_fn
+    if _embedding_fn is None:
+        from config.config import config_mini as config
+        from rag.utils import get_embedding_function
+        _embedding_fn = get_embedding_function(model_name=config.EMBEDDING_MODEL_FOR_NODE_RETRIEVAL)
+    return _embedding_fn
+
+
+def set_embedding_fn(embedding_fn):
+    """
+    Input: object with embed_query(str) and embed_documents(List[str]) - e.g. a deterministic fake for offline benchmarks
+    Replaces the shared embedding function; in-process stores are cleared since their embeddings came from the old one,
+    and the disk cache (keyed by the configured model name) is no longer used
+    """
+    global _embedding_fn, _disk_cache, _disk_cache_loaded
+    _embedding_fn = embedding_fn
+    _disk_cache, _disk_cache_loaded = None, True
+    _entity_embd_store.clear()
+    _triple_embd_store.clear()
+
+
+def _get_disk_cache(readonly=False):
+    """
+    Returns the persistent EmbeddingCache, or None if EMBEDDING_CACHE_PATH is unset - opened on the first call
+    """
+    global _disk_cache, _disk_cache_loaded
+    if not _disk_cache_loaded:
+        from config.config import config_mini as config
+        _disk_cache = EmbeddingCache(
+            config.EMBEDDING_CACHE_PATH,
+            config.EMBEDDING_MODEL_FOR_NODE_RETRIEVAL,
+            config.EMBEDDING_CACHE_MAX_ENTRIES,
+            readonly=readonly
+        ) if config.EMBEDDING_CACHE_PATH else None
+        _disk_cache_loaded = True
+    return _disk_cache
+
+
+def disk_cache_writable():
+    """
+    Opens the disk cache (taking its writer lock) - returns False if it is disabled or another process writes it
+    """
+    disk_cache = _get_disk_cache()
+    return disk_cache is not None and not disk_cache.readonly
+
+
+def collect_new_embeddings(use_disk_cache=True):
+    """
+    Input: use_disk_cache - False: do not read the disk cache, e.g. when the parent process is not its writer
+    Switch this process to read-only disk cache use, keeping new embeddings and cache hits for drain_new_embeddings
+    and drain_cache_hits (only the parent process writes the cache files)
+    """
+    global _collected_embeddings, _collected_hits, _disk_cache, _disk_cache_loaded
+    _collected_embeddings, _collected_hits = {}, {}
+    if use_disk_cache:
+        _get_disk_cache(readonly=True)
+    else:
+        _disk_cache, _disk_cache_loaded = None, True
+
+
+def drain_new_embeddings():
+    """
+    Returns dict[str] = np.ndarray - embeddings computed since the last call (empty unless collecting)
+    """
+    global _collected_embeddings
+    if not _collected_embeddings:
+        return {}
+    drained, _collected_embeddings = _collected_embeddings, {}
+    return drained
+
+
+def drain_cache_hits():
+    """
+    Returns List[str] - texts served from the disk cache since the last call, most recently used last (empty unless collecting)
+    """
+    global _collected_hits
+    if not _collected_hits:
+        return []
+    drained, _collected_hits = list(_collected_hits), {}
+    return drained
+
+
+def store_embeddings(embeddings, cache_hits=()):
+    """
+    Inputs:
+        embeddings: dict[str] = np.ndarray - simplified text to embedding, e.g. drained from a worker process
+        cache_hits: iterable of str - texts a worker process served from the disk cache, most recently used last
+    """
+    disk_cache = _get_disk_cache()
+    if disk_cache is None:
+        return
+    disk_cache.touch(cache_hits)
+    for text, embedding in embeddings.items():
+        disk_cache.put(text, embedding)
+
+
+def _embed_texts(texts):
+    """
+    Input: List[str] - already simplified texts
+    Looks texts up in the disk cache, embeds the rest (single texts via embed_query, more in one embed_documents batch)
+
+    Returns List[np.ndarray] in input order
+    """
+    with timer("embed"):
+        embeddings = {}
+        disk_cache = _get_disk_cache()
+        if disk_cache is not None:
+            for text in texts:
+                cached = disk_cache.get(text)
+                if cached is not None:
+                    embeddings[text] = cached
+                    if _collected_hits is not None:
+                        _collected_hits.pop(text, None)
+                        _collected_hits[text] = None
+
+        missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+        if len(missing) == 1:
+            new_embeddings = [get_embedding_fn().embed_query(missing[0])]
+        elif missing:
+            new_embeddings = get_embedding_fn().embed_documents(missing)
+        else:
+            new_embeddings = []
+    increment("embedding_cache_hits", len(embeddings))
+    increment("embedding_cache_misses", len(missing))
+
+    for text, embedding in zip(missing, new_embeddings):
+        embeddings[text] = np.array(embedding, dtype=np.float32)
+        if disk_cache is not None:
+            disk_cache.put(text, embeddings[text])
+        if _collected_embeddings is not None:
+            _collected_embeddings[text] = embeddings[text]
+    return [embeddings[text] for text in texts]
+
 
 def _triple_to_str(triple):
     """
@@ -24,8 +171,9 @@ def embed_triple(triple):
     Creates and stores embedding for input triple
     """
     if triple not in _triple_embd_store:
-        embedding  = get_text_embedding(_triple_to_str(triple), embedding_fn)
-        _triple_embd_store[triple] = np.array(embedding, dtype=np.float32)
+        _triple_embd_store[triple] = _embed_texts([_triple_to_str(triple)])[0]
+    else:
+        increment("embedding_store_hits")
     return _triple_embd_store[triple]
 
 
@@ -35,6 +183,75 @@ def _embed_entity(entity):
     """
     entity = _simplify(entity)
     if entity not in _entity_embd_store:
-        embedding = get_text_embedding(entity, embedding_fn)
-        _entity_embd_store[entity] = np.array(embedding, dtype=np.float32)
+        _entity_embd_store[entity] = _embed_texts([entity])[0]
+    else:
+        increment("embedding_store_hits")
     return _entity_embd_store[entity]
+
+
+def _l2_normalize(matrix):
+    """
+    Row-wise L2 normalization - zero rows are left as zeros
+    """
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def embed_entities(entities):
+    """
+    Input: List[str] - entity strings (simplified inside, like _embed_entity)
+    Embeds every entity missing from the stores in a single batched embed_documents call
+
+    Returns np.ndarray of shape (len(entities), dim) - rows are L2-normalized, in input order
+    """
+    simplified = [_simplify(e) for e in entities]
+    missing = list(dict.fromkeys(e for e in simplified if e not in _entity_embd_store))
+    increment("embedding_store_hits", len(simplified) - len(missing))
+    for e, embedding in zip(missing, _embed_texts(missing)):
+        _entity_embd_store[e] = embedding
+    if not simplified:
+        return np.zeros((0, 0), dtype=np.float32)
+    return _l2_normalize(np.stack([_entity_embd_store[e] for e in simplified]))
+
+
+def embed_triples(triples):
+    """
+    Input: List[(source, relation, target)]
+    Embeds every triple missing from the stores in a single batched embed_documents call
+
+    Returns np.ndarray of shape (len(triples), dim) - rows are L2-normalized, in input order
+    """
+    missing = list(dict.fromkeys(triple for triple in triples if triple not in _triple_embd_store))
+    increment("embedding_store_hits", len(triples) - len(missing))
+    for triple, embedding in zip(missing, _embed_texts([_triple_to_str(triple) for triple in missing])):
+        _triple_embd_store[triple] = embedding
+    if not triples:
+        return np.zeros((0, 0), dtype=np.float32)
+    return _l2_normalize(np.stack([_triple_embd_store[triple] for triple in triples]))
+
+
+class TripleEmbeddingMatrix:
+    """
+    L2-normalized embeddings of a record's RAG triples, row i = edge id i - a row is embedded on first use,
+    so only triples on paths that are actually scored get embedded
+    """
+
+    def __init__(self, triples):
+        self.triples = triples
+        self._rows = None
+        self._embedded = np.zeros(len(triples), dtype=bool)
+
+    def rows(self, edge_ids):
+        """
+        Input: np.ndarray of edge ids
+        Returns np.ndarray of shape (len(edge_ids), dim) - triples not embedded yet are embedded in one batch
+        """
+        missing = np.unique(edge_ids[~self._embedded[edge_ids]])
+        if missing.size:
+            embeddings = embed_triples([self.triples[i] for i in missing])
+            if self._rows is None:
+                self._rows = np.zeros((len(self.triples), embeddings.shape[1]), dtype=embeddings.dtype)
+            self._rows[missing] = embeddings
+            self._embedded[missing] = True
+        return self._rows[edge_ids]
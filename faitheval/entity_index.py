@@ -0,0 +1,59 @@
+"""
+Index over a record's fuzzy-matchable RAG entities - replaces the per-candidate scans in fuzzy_match_entity.
+
+Lookups are exact: they return the same sets as the exhaustive scans at ENT_JACC_THRESHOLD / ENT_COS_THRESHOLD.
+    Jaccard - through the RagGraph's inverted token index: only entities sharing a token with the query are scored,
+              and only those whose token count allows a Jaccard measure over the threshold (min(|A|, |B|) / max(|A|, |B|) >= t)
+    cosine  - one matrix-vector product over the L2-normalized candidate embeddings, embedded on the first cosine lookup
+"""
+import numpy as np
+
+from faitheval.embedding_helpers import embed_entities
+
+
+class EntityIndex:
+    def __init__(self, rag_graph, candidates):
+        """
+        Inputs:
+            rag_graph: RagGraph (frozen) - the record's graph, its token index is shared
+            candidates: List[str] - fuzzy candidate RAG entities (simplified), as returned by fuzzy_candidate_entities
+        """
+        self.graph = rag_graph
+        self.candidates = candidates
+        self._embeddings = None     # L2-normalized candidate embeddings, one row per candidate - set on the first cosine lookup
+        # strict-type entities are in the graph's token index too, but never fuzzy match
+        self._is_candidate = np.zeros(len(rag_graph.entity_names), dtype=bool)
+        self._is_candidate[[rag_graph.entity_ids[e] for e in candidates]] = True
+
+    def jaccard_matches(self, entity_simplified, threshold):
+        """
+        Input: entity_simplified - output of _simplify
+        Returns Set[str] - candidates e with _token_overlap_jaccard(entity_simplified, e) >= threshold
+        """
+        query_tokens = set(entity_simplified.split())
+        postings = self.graph.token_postings
+        posting_lists = [postings[token] for token in query_tokens if token in postings]
+        if not posting_lists:
+            return set()
+        overlap = np.bincount(np.concatenate(posting_lists), minlength=len(self._is_candidate))
+        ids = np.flatnonzero(overlap)
+        ids = ids[self._is_candidate[ids]]
+        sizes = self.graph.token_counts[ids]
+        n_query = len(query_tokens)
+        # size filter first: Jaccard <= min(|A|, |B|) / max(|A|, |B|) (also after rounding, division is monotonic)
+        keep = np.minimum(sizes, n_query) / np.maximum(sizes, n_query) >= threshold
+        ids, sizes = ids[keep], sizes[keep]
+        jaccard = overlap[ids] / (n_query + sizes - overlap[ids])
+        return {self.graph.entity_names[i] for i in ids[jaccard >= threshold]}
+
+    def cosine_matches(self, entity_embd, threshold):
+        """
+        Input: entity_embd - L2-normalized query embedding
+        Returns Set[str] - candidates whose embedding has cosine similarity >= threshold with entity_embd
+        """
+        if not self.candidates:
+            return set()
+        if self._embeddings is None:
+            self._embeddings = embed_entities(self.candidates)
+        cosine_sim_scores = self._embeddings @ entity_embd
+        return {self.candidates[i] for i in np.flatnonzero(cosine_sim_scores >= threshold)}
@@ -1,37 +1,214 @@
 import argparse
 import json
+import multiprocessing
+import os
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import islice
 from tqdm import tqdm
 
 from faitheval.faithfulness import score_record
+from faitheval import embedding_helpers, instrumentation
 from faitheval.logging_config import logger
 
+_in_worker = False      # set in pool worker processes - their metrics are handed back to the parent per record
 
-def main(input_path, output_path, hallucination_log_path):
+
+def _init_worker(use_disk_cache):
+    """
+    Runs once per worker process - the sentence-transformer is loaded on the worker's first embedding cache miss,
+    disk embedding cache is only read in workers (if the parent is its writer), parent writes what workers embed
+    and the recency of their cache hits once they are gone
+    """
+    global _in_worker
+    _in_worker = True
+    # keep this worker's torch to a single thread (loaded lazily, after this), otherwise workers oversubscribe the cores
+    os.environ["OMP_NUM_THREADS"] = "1"
+    embedding_helpers.collect_new_embeddings(use_disk_cache)
+
+
+def _score_row(row):
+    """
+    Worker task: score one record
+    Returns (question_id, rounded score, hallucination details, embeddings new to this worker, disk cache hits,
+    worker metrics or None)
+    """
+    logger.info("*** Processing question %s ***", row["question_id"])
+    raw_score, hallucinations_for_row = score_record(row)
+    worker_metrics = instrumentation.metrics.drain() if _in_worker else None
+    return (row["question_id"], round(raw_score, 3), hallucinations_for_row, embedding_helpers.drain_new_embeddings(),
+            embedding_helpers.drain_cache_hits(), worker_metrics)
+
+
+def _score_rows(rows, workers):
+    """
+    Input: rows - iterable of records, consumed lazily
+    Yields (question_id, score, hallucination details) in input order - sharded over a process pool if workers > 1
+    """
+    if workers <= 1:
+        for row in rows:
+            current_q_id, score, hallucinations_for_row, _, _, _ = _score_row(row)
+            yield current_q_id, score, hallucinations_for_row
+        return
+
+    rows = iter(rows)
+    ctx = multiprocessing.get_context("spawn")
+    # workers memory-map the disk embedding cache as it was at their start - the parent holds its writer lock and
+    # leaves it untouched while they run; without the lock another process may rewrite it, so workers do not read it
+    use_disk_cache = embedding_helpers.disk_cache_writable()
+    run_embeddings, run_hits = {}, {}
+    try:
+        with ctx.Pool(processes=workers, initializer=_init_worker, initargs=(use_disk_cache,)) as pool:
+            # bounded windows, so a lazily read input is never pulled into memory all at once
+            while batch := list(islice(rows, workers * 64)):
+                for current_q_id, score, hallucinations_for_row, new_embeddings, cache_hits, worker_metrics in pool.imap(_score_row, batch, chunksize=8):
+                    run_embeddings.update(new_embeddings)
+                    for text in cache_hits:
+                        run_hits.pop(text, None)
+                        run_hits[text] = None
+                    instrumentation.metrics.merge(worker_metrics)
+                    yield current_q_id, score, hallucinations_for_row
+    finally:
+        embedding_helpers.store_embeddings(run_embeddings, run_hits)
+
+
+def _iter_jsonl(path):
+    """
+    Lazily yields records from a JSONL file, skipping blank lines
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _load_completed(output_path):
+    """
+    Reads an existing JSONL output (if any) to resume from - a partially written last line is truncated away
+
+    Returns (set of completed question_ids, their scores in file order, last completed question_id or None)
+    """
+    completed, scores, last_q_id = set(), [], None
+    if not os.path.exists(output_path):
+        return completed, scores, last_q_id
+
+    valid_bytes = 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            valid_bytes += len(line)
+            completed.add(row["question_id"])
+            scores.append(row["faithfulness_score"])
+            last_q_id = row["question_id"]
+    with open(output_path, "ab") as f:
+        f.truncate(valid_bytes)
+    return completed, scores, last_q_id
+
+
+def _drop_incomplete_hallucinations(hallucination_log_path, completed):
+    """
+    Keep only hallucination entries of completed records - an entry is written before its record,
+    so a crash in between would otherwise leave a duplicate after resuming.
+    Entries are written in input order, so incomplete ones can only be at the end - the file is truncated after the
+    last entry of a completed record (read line by line, like _load_completed)
+    """
+    if not os.path.exists(hallucination_log_path):
+        return
+    valid_bytes = read_bytes = 0
+    with open(hallucination_log_path, "rb") as f:
+        for line in f:
+            read_bytes += len(line)
+            if not line.strip():
+                continue
+            try:
+                if json.loads(line)["question_id"] not in completed:
+                    continue
+            except json.JSONDecodeError:
+                break
+            valid_bytes = read_bytes
+    if valid_bytes != read_bytes:
+        with open(hallucination_log_path, "ab") as f:
+            f.truncate(valid_bytes)
+
+
+def _write_metrics(metrics_path):
+    """
+    Writes this run's scoring metrics - Prometheus text format if metrics_path ends with .prom, JSON summary otherwise
+    """
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        if metrics_path.endswith(".prom"):
+            f.write(instrumentation.metrics.to_prometheus())
+        else:
+            json.dump(instrumentation.metrics.summary(), f, indent=4, ensure_ascii=False)
+    print(f"Scoring metrics written to: {metrics_path}")
+
+
+def main_streaming(input_path, output_path, hallucination_log_path, workers=1, metrics_path=None):
+    """
+    JSONL mode: records are read lazily, each scored record and its hallucination entry
+    ({"question_id": ..., "hallucinations": [...]}) is appended as soon as it finishes.
+    Restarting with the same paths resumes after the last completed question_id.
+    """
+    completed, scores, last_q_id = _load_completed(output_path)
+    _drop_incomplete_hallucinations(hallucination_log_path, completed)
+    rows = _iter_jsonl(input_path)
+    if last_q_id is not None:
+        # output is written in input order - skip exactly the records already scored, keeping only the last one
+        skipped = deque(islice(rows, len(scores)), maxlen=1)
+        if not skipped or skipped[-1]["question_id"] != last_q_id:
+            raise ValueError(f"{output_path} does not match the beginning of {input_path} - cannot resume after question {last_q_id}")
+        print(f"Resuming after question {last_q_id} ({len(scores)} records already scored)")
+
+    pending = deque()     # rows sent for scoring, held only until their scores come back (in order)
+    def _pending_rows():
+        for row in rows:
+            pending.append(row)
+            yield row
+
+    with open(output_path, "a", encoding="utf-8") as out_f, open(hallucination_log_path, "a", encoding="utf-8") as hall_f:
+        for current_q_id, score, hallucinations_for_row in tqdm(_score_rows(_pending_rows(), workers), desc="Processing rows"):
+            row = pending.popleft()
+            row["faithfulness_score"] = score
+            scores.append(score)
+            logger.info("%s : faithfulness = %.3f", current_q_id, score)
+
+            hall_f.write(json.dumps({"question_id": current_q_id, "hallucinations": hallucinations_for_row}, ensure_ascii=False) + "\n")
+            hall_f.flush()
+            out_f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out_f.flush()
+
+    if scores:
+        print("\nAverage faithfulness score:", f"{float(np.mean(scores)):.3f}")
+    print(f"Hallucination details logged to: {hallucination_log_path}")
+    if metrics_path:
+        _write_metrics(metrics_path)
+
+
+def main(input_path, output_path, hallucination_log_path, workers=1, metrics_path=None):
     data = json.load(open(input_path, "r", encoding="utf-8"))
     scores = []
     hallucination_details = defaultdict(list)
 
-    for row in tqdm(data, desc="Processing rows"):
-        current_q_id = row['question_id']
-        logger.info(f"*** Processing question {current_q_id} ***")
-        raw_score, hallucinations_for_row = score_record(row)
-        score = round(raw_score, 3)
+    for row, (current_q_id, score, hallucinations_for_row) in zip(data, tqdm(_score_rows(data, workers), total=len(data), desc="Processing rows")):
         row["faithfulness_score"] = score
         scores.append(score)
         hallucination_details[current_q_id] = hallucinations_for_row
-        logger.info(f"{row['question_id']} : faithfulness = {row['faithfulness_score']:.3f}")
-    
+        logger.info("%s : faithfulness = %.3f", current_q_id, score)
+
     print("\nAverage faithfulness score:", f"{float(np.mean(scores)):.3f}")
 
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
-    
+
     if hallucination_details:
         with open(hallucination_log_path, "w",  encoding="utf-8") as f:
             json.dump(hallucination_details, f, indent=4, ensure_ascii=False)
         print(f"Hallucination details logged to: {hallucination_log_path}")
+    if metrics_path:
+        _write_metrics(metrics_path)
 
 
 if __name__ == "__main__":
@@ -39,6 +216,12 @@ if __name__ == "__main__":
     parser.add_argument("--input_path", type=str, required=True, help="Path to input JSON file")
     parser.add_argument("--output_path", type=str, required=True, help="Path to output JSON file")
     parser.add_argument("--hallucination_log_path", type=str, required=True, help="Path to hallucination details JSON file")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes to score records in parallel")
+    parser.add_argument("--stream", action="store_true", help="Read/write JSONL record by record and resume an interrupted run (default for .jsonl input)")
+    parser.add_argument("--metrics_path", type=str, default=None, help="Path to write per-stage timings, counters and slowest records (JSON, or Prometheus text if it ends with .prom)")
 
     args = parser.parse_args()
-    main(args.input_path, args.output_path, args.hallucination_log_path)
+    if args.stream or args.input_path.endswith(".jsonl"):
+        main_streaming(args.input_path, args.output_path, args.hallucination_log_path, args.workers, args.metrics_path)
+    else:
+        main(args.input_path, args.output_path, args.hallucination_log_path, args.workers, args.metrics_path)
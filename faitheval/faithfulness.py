@@ -3,10 +3,14 @@ import numpy as np
 
 import faitheval.constants as constants
 from faitheval.logging_config import logger
+from faitheval.instrumentation import metrics, timer
 from faitheval.utils import is_negative_relation
-from faitheval.embedding_helpers import embed_triple
+from faitheval.embedding_helpers import embed_triple, TripleEmbeddingMatrix
+from faitheval.graph_helpers import PathIndex
+from faitheval.entity_index import EntityIndex
 from faitheval.scoring_helpers import (
-    prepare_rag_structures,
+    build_rag_graph,
+    fuzzy_candidate_entities,
     fuzzy_match_entity,
     score_positive_triple,
     score_negative_triple
@@ -28,32 +32,54 @@ def score_record(record):
     Outputs:
         faithfulness/groundedness score for the record (value between [0,1])
     """
+    with metrics.record(record.get("question_id"), rag_triples=len(record["kg_rag"]), cot_triples=len(record["cot_kg"])):
+        return _score_record(record)
+
+
+def _score_record(record):
     cot_triples = record["cot_kg"]
     rag_triples_raw = record["kg_rag"]
     #question_text = record["question"].lower() # TODO: check existence of entity from cot-kg in question, if entity is absent from both kg-rag and question, score 0 (hallucincation) and move to next record 
     
     hallucination_details_for_record = []
 
-    simplified_rag_triples, edge_idx_rag, adj_rag, all_simplified_rag_entities_set, rag_entity_details = prepare_rag_structures(rag_triples_raw)
+    with timer("prepare"):
+        rag_graph = build_rag_graph(rag_triples_raw)
+    simplified_rag_triples = rag_graph.triples
+    edge_idx_rag = rag_graph.edge_index
+    all_simplified_rag_entities_set = rag_graph.entity_ids.keys()
+    rag_entity_details = rag_graph.entity_details
 
     logger.info("rag_triples: %s", simplified_rag_triples)
     logger.info("cot_triples: %s", cot_triples)
 
+    with timer("match"):
+        # Jaccard candidates come from the graph's inverted token index instead of a scan over all RAG entities,
+        # the candidates are embedded in one batch on the first cosine fallback, shared by every CoT entity below
+        entity_index = EntityIndex(rag_graph, fuzzy_candidate_entities(all_simplified_rag_entities_set, rag_entity_details, constants.STRICT_RAG_ENTITY_TYPES))
+    # paths are enumerated once per source entity and reused by every CoT triple below
+    with timer("prepare"):
+        path_index = PathIndex(rag_graph, constants.MAX_PATH_LEN)
+    # row i = edge id i - path scoring gathers rows from it, triples are embedded when a path through them is scored
+    rag_triple_embds = TripleEmbeddingMatrix(simplified_rag_triples)
+
     triple_scores = []
 
     for s_cot_raw, rel_cot, t_cot_raw in cot_triples: 
         cot_triple_embd = embed_triple((s_cot_raw, rel_cot, t_cot_raw))
         cot_triple_raw = tuple((s_cot_raw, rel_cot, t_cot_raw))
 
-        source_entities_rag = fuzzy_match_entity(s_cot_raw, all_simplified_rag_entities_set, rag_entity_details, constants.STRICT_RAG_ENTITY_TYPES)
-        target_entities_rag = fuzzy_match_entity(t_cot_raw, all_simplified_rag_entities_set, rag_entity_details, constants.STRICT_RAG_ENTITY_TYPES)
+        with timer("match"):
+            source_entities_rag = fuzzy_match_entity(s_cot_raw, all_simplified_rag_entities_set, rag_entity_details, constants.STRICT_RAG_ENTITY_TYPES, entity_index=entity_index)
+            target_entities_rag = fuzzy_match_entity(t_cot_raw, all_simplified_rag_entities_set, rag_entity_details, constants.STRICT_RAG_ENTITY_TYPES, entity_index=entity_index)
 
-        # For CoT triples with positive relations (standard)    
-        if not is_negative_relation(rel_cot):
-            score = score_positive_triple(cot_triple_embd, source_entities_rag, target_entities_rag, edge_idx_rag, adj_rag, cot_triple_raw, hallucination_details_for_record)
-        # For CoT triples with negative relations (negation of relations defined in KG - Ex: "does not associate", "is not", etc.)
-        else:
-            score = score_negative_triple(source_entities_rag, target_entities_rag, edge_idx_rag, adj_rag, cot_triple_raw, hallucination_details_for_record)
+        with timer("score"):
+            # For CoT triples with positive relations (standard)    
+            if not is_negative_relation(rel_cot):
+                score = score_positive_triple(cot_triple_embd, source_entities_rag, target_entities_rag, edge_idx_rag, path_index, rag_triple_embds, cot_triple_raw, hallucination_details_for_record)
+            # For CoT triples with negative relations (negation of relations defined in KG - Ex: "does not associate", "is not", etc.)
+            else:
+                score = score_negative_triple(source_entities_rag, target_entities_rag, edge_idx_rag, path_index, rag_triple_embds, cot_triple_raw, hallucination_details_for_record)
 
         triple_scores.append(score)
 
@@ -1,4 +1,10 @@
+import sys
 from collections import defaultdict, deque
+from collections.abc import Mapping
+
+import numpy as np
+
+from faitheval.instrumentation import increment, timer
 
 def build_edge_index(triples):
     """
@@ -55,3 +61,262 @@ def find_paths(adj, start_node, final_node, max_len = 2):
                 q.append(new_path)
 
     return paths
+
+
+class EntityRecord:
+    """
+    Details of one RAG entity - reads like the {"type": ..., "raw": ...} dicts it replaces
+    """
+    __slots__ = ("type", "raw")
+
+    def __init__(self, entity_type, raw):
+        self.type = entity_type
+        self.raw = raw
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __repr__(self):
+        return repr({"type": self.type, "raw": self.raw})
+
+
+class RagGraph:
+    """
+    Interned RAG subgraph: entities and relations are stored once and referred to by integer ids,
+    edges live in NumPy arrays with a CSR-style out-edge index (indptr / out_edges).
+
+    Build with add_entity / add_edge, then freeze(). The edge_index, adjacency and entity_details
+    properties are read-only views with the same lookups as the dicts from build_edge_index,
+    build_adj_with_rel and prepare_rag_structures.
+    """
+
+    def __init__(self):
+        self.entity_ids = {}        # dict[entity_str] = entity_id
+        self.entity_names = []      # entity_id -> entity_str
+        self.entity_records = []    # entity_id -> EntityRecord
+        self.relation_ids = {}      # dict[relation_str] = relation_id
+        self.relation_names = []    # relation_id -> relation_str
+        self._edges = []            # (src_id, rel_id, dst_id) while building
+
+        self.edge_src = self.edge_rel = self.edge_dst = None    # np.ndarray[int32], indexed by edge id
+        self.indptr = self.out_edges = None                     # CSR: out-edges of node n are out_edges[indptr[n]:indptr[n + 1]]
+        self.entity_tokens = None   # entity_id -> frozenset of interned tokens
+        self.token_postings = None  # dict[token] = np.ndarray of ids of entities containing the token
+        self.token_counts = None    # np.ndarray[int32] - entity_id -> number of tokens
+        self._pair_relation = {}    # dict[(src_id, dst_id)] = rel_id - last edge between a pair wins, like build_edge_index
+
+    def add_entity(self, name, entity_type, raw):
+        """
+        Returns entity id - details of the first occurrence are kept
+        """
+        entity_id = self.entity_ids.get(name)
+        if entity_id is None:
+            entity_id = self.entity_ids[name] = len(self.entity_names)
+            self.entity_names.append(name)
+            self.entity_records.append(EntityRecord(entity_type, raw))
+        return entity_id
+
+    def _relation_id(self, relation):
+        relation_id = self.relation_ids.get(relation)
+        if relation_id is None:
+            relation_id = self.relation_ids[relation] = len(self.relation_names)
+            self.relation_names.append(relation)
+        return relation_id
+
+    def add_edge(self, source, relation, target):
+        """
+        Input: (source, relation, target) - both entities must have been added
+        Returns edge id (position in insertion order)
+        """
+        s_id, r_id, t_id = self.entity_ids[source], self._relation_id(relation), self.entity_ids[target]
+        self._edges.append((s_id, r_id, t_id))
+        self._pair_relation[(s_id, t_id)] = r_id
+        return len(self._edges) - 1
+
+    def freeze(self):
+        """
+        Moves edges into NumPy arrays and builds the CSR out-edge index (edges keep insertion order per node)
+        """
+        edges = np.array(self._edges, dtype=np.int32).reshape(-1, 3)
+        self.edge_src, self.edge_rel, self.edge_dst = edges[:, 0], edges[:, 1], edges[:, 2]
+        self.out_edges = np.argsort(self.edge_src, kind="stable").astype(np.int32)
+        self.indptr = np.zeros(len(self.entity_names) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.edge_src, minlength=len(self.entity_names)), out=self.indptr[1:])
+        self._edges = []
+        self._build_token_index()
+        return self
+
+    def _build_token_index(self):
+        """
+        Token set of every entity and the inverted index token -> entity ids, for Jaccard matching.
+        Entity names are already simplified (_simplify is idempotent), so tokens are a plain split - same sets as _tokens
+        """
+        postings = defaultdict(list)
+        self.entity_tokens = []
+        for entity_id, name in enumerate(self.entity_names):
+            # interned - the same SPOKE names recur across records, equal tokens then share one string object
+            tokens = frozenset(map(sys.intern, name.split()))
+            self.entity_tokens.append(tokens)
+            for token in tokens:
+                postings[token].append(entity_id)
+        self.token_postings = {token: np.array(ids, dtype=np.int32) for token, ids in postings.items()}
+        self.token_counts = np.fromiter(map(len, self.entity_tokens), dtype=np.int32, count=len(self.entity_tokens))
+
+    @property
+    def num_edges(self):
+        return len(self.edge_src)
+
+    def triple(self, edge_id):
+        """
+        Returns (source, relation, target) strings of an edge
+        """
+        return (self.entity_names[self.edge_src[edge_id]], self.relation_names[self.edge_rel[edge_id]], self.entity_names[self.edge_dst[edge_id]])
+
+    @property
+    def triples(self):
+        return [self.triple(e) for e in range(self.num_edges)]
+
+    @property
+    def edge_index(self):
+        return _EdgeIndexView(self)
+
+    @property
+    def adjacency(self):
+        return _AdjacencyView(self)
+
+    @property
+    def entity_details(self):
+        return _EntityDetailsView(self)
+
+
+class _EdgeIndexView(Mapping):
+    """
+    (source, target) -> relation, like build_edge_index
+    """
+    def __init__(self, graph):
+        self._g = graph
+
+    def __getitem__(self, pair):
+        s_id, t_id = self._g.entity_ids.get(pair[0]), self._g.entity_ids.get(pair[1])
+        r_id = self._g._pair_relation.get((s_id, t_id))
+        if r_id is None:
+            raise KeyError(pair)
+        return self._g.relation_names[r_id]
+
+    def __iter__(self):
+        names = self._g.entity_names
+        return ((names[s_id], names[t_id]) for s_id, t_id in self._g._pair_relation)
+
+    def __len__(self):
+        return len(self._g._pair_relation)
+
+
+class _AdjacencyView(Mapping):
+    """
+    source -> [(target, relation)], like the defaultdict from build_adj_with_rel (missing sources give [])
+    """
+    def __init__(self, graph):
+        self._g = graph
+
+    def _out_degree(self, entity_id):
+        return int(self._g.indptr[entity_id + 1] - self._g.indptr[entity_id])
+
+    def __getitem__(self, source):
+        g = self._g
+        s_id = g.entity_ids.get(source)
+        if s_id is None:
+            return []
+        edge_ids = g.out_edges[g.indptr[s_id]:g.indptr[s_id + 1]]
+        return [(g.entity_names[g.edge_dst[e]], g.relation_names[g.edge_rel[e]]) for e in edge_ids]
+
+    def __contains__(self, source):
+        s_id = self._g.entity_ids.get(source)
+        return s_id is not None and self._out_degree(s_id) > 0
+
+    def __iter__(self):
+        seen = set()
+        for s_id in self._g.edge_src.tolist():
+            if s_id not in seen:
+                seen.add(s_id)
+                yield self._g.entity_names[s_id]
+
+    def __len__(self):
+        return int(np.count_nonzero(np.diff(self._g.indptr)))
+
+
+class _EntityDetailsView(Mapping):
+    """
+    entity -> EntityRecord, like the rag_entity_details dict
+    """
+    def __init__(self, graph):
+        self._g = graph
+
+    def __getitem__(self, entity):
+        return self._g.entity_records[self._g.entity_ids[entity]]
+
+    def __iter__(self):
+        return iter(self._g.entity_names)
+
+    def __len__(self):
+        return len(self._g.entity_names)
+
+
+class PathIndex:
+    """
+    Per-record index of bounded-length paths in the RAG graph - replaces repeated find_paths calls.
+
+    Paths out of a source node are enumerated once (breadth first, like find_paths, on first lookup of that source)
+    and stored compactly as tuples of integer edge ids, grouped by target node id, so every later
+    (source, target) lookup is a dict access.
+    """
+
+    def __init__(self, graph, max_len=2):
+        """
+        Inputs:
+            graph: RagGraph (frozen)
+            max_len: int - max possible length of path
+        """
+        self.graph = graph
+        self.max_len = max_len
+        # plain lists - traversal below is a Python loop, indexing NumPy scalars there is slower
+        self._indptr = graph.indptr.tolist()
+        self._out_edges = graph.out_edges.tolist()
+        self._edge_target = graph.edge_dst.tolist()
+        self._paths_from = {}       # source node_id -> dict[target node_id] = List[Tuple[edge_id, ...]]
+
+    def _enumerate_from(self, start_id):
+        """
+        All paths of up to max_len edges out of start_id, level by level in BFS order.
+        A path is kept for target v only if it does not pass through v earlier - find_paths stops at its target.
+        """
+        paths_by_target = {}
+        level = [((), start_id, ())]   # (edge ids, last node, nodes reached before last node)
+        for _ in range(self.max_len):
+            next_level = []
+            for edges, last_node, visited in level:
+                for edge_id in self._out_edges[self._indptr[last_node]:self._indptr[last_node + 1]]:
+                    next_node = self._edge_target[edge_id]
+                    new_edges = edges + (edge_id,)
+                    if next_node not in visited:
+                        paths_by_target.setdefault(next_node, []).append(new_edges)
+                    next_level.append((new_edges, next_node, visited + (next_node,)))
+            level = next_level
+        return paths_by_target
+
+    def edge_paths(self, start_node, final_node):
+        """
+        Returns List[Tuple[edge_id, ...]] - paths from start_node to final_node, in find_paths order
+        """
+        start_id, final_id = self.graph.entity_ids.get(start_node), self.graph.entity_ids.get(final_node)
+        if start_id is None or final_id is None:
+            return []
+        if start_id not in self._paths_from:
+            with timer("path"):
+                self._paths_from[start_id] = self._enumerate_from(start_id)
+            increment("paths_enumerated", sum(map(len, self._paths_from[start_id].values())))
+        return self._paths_from[start_id].get(final_id, [])
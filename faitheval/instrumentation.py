@@ -0,0 +1,166 @@
+"""
+Per-run timing and counters for score_record and its helpers.
+
+Stages (timed with `timer(stage)`, nested timers are exclusive - time in an inner stage is not charged to the outer one):
+    prepare - RAG graph / path index construction
+    match   - CoT -> RAG entity matching
+    path    - path enumeration in the RAG graph
+    embed   - embedding cache lookups and embedding model calls
+    score   - triple scoring against edges and paths
+
+Counters (`increment(name)`): embedding_store_hits, embedding_cache_hits, embedding_cache_misses, paths_enumerated,
+entity_matches_exact, entity_matches_jaccard, entity_matches_cosine, entity_matches_none
+
+Per record (`record(question_id)`): total time, its stage times and counters - the slowest records are kept.
+Export with summary() (JSON-able dict) or to_prometheus() (Prometheus text exposition format).
+"""
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+
+STAGES = ("prepare", "match", "path", "embed", "score")
+SLOWEST_RECORDS = 10        # slowest records kept with their stage/counter breakdown
+
+
+class Metrics:
+    def __init__(self, slowest_records=SLOWEST_RECORDS):
+        self.slowest_records = slowest_records
+        self.reset()
+
+    def reset(self):
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.stage_calls = dict.fromkeys(STAGES, 0)
+        self.counters = {}
+        self.records = 0
+        self.record_seconds = 0.0
+        self._slowest = []          # min-heap of (seconds, tie-breaker, record info)
+        self._seq = itertools.count()
+        self._stack = []            # [stage, seconds spent in nested timers] of the open timers
+        self._record = None         # breakdown of the record being scored
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Charges the wall time of the block to stage, minus time spent in timers nested inside it
+        """
+        frame = [stage, 0.0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            exclusive = elapsed - frame[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + exclusive
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+            if self._record is not None:
+                self._record["stages"][stage] = self._record["stages"].get(stage, 0.0) + exclusive
+
+    def increment(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        if self._record is not None:
+            self._record["counters"][name] = self._record["counters"].get(name, 0) + n
+
+    @contextmanager
+    def record(self, question_id, **info):
+        """
+        Times one record - info (e.g. input sizes) is kept with it if it ends up among the slowest records
+        """
+        self._record = {"question_id": question_id, **info, "stages": {}, "counters": {}}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            current, self._record = self._record, None
+            current["seconds"] = time.perf_counter() - start
+            self.records += 1
+            self.record_seconds += current["seconds"]
+            self._keep_if_slow(current)
+
+    def _keep_if_slow(self, record_info):
+        if self.slowest_records <= 0:
+            return
+        entry = (record_info["seconds"], next(self._seq), record_info)
+        if len(self._slowest) < self.slowest_records:
+            heapq.heappush(self._slowest, entry)
+        elif entry[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def summary(self):
+        """
+        Returns dict - totals per stage, counters and the slowest records (slowest first); seconds are rounded
+        """
+        slowest = sorted((info for _, _, info in self._slowest), key=lambda info: info["seconds"], reverse=True)
+        return {
+            "records": self.records,
+            "record_seconds": round(self.record_seconds, 6),
+            "stages": {
+                stage: {"seconds": round(self.stage_seconds[stage], 6), "calls": self.stage_calls[stage]}
+                for stage in self.stage_seconds
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "slowest_records": [
+                {
+                    **info,
+                    "seconds": round(info["seconds"], 6),
+                    "stages": {stage: round(seconds, 6) for stage, seconds in info["stages"].items()},
+                }
+                for info in slowest
+            ],
+        }
+
+    def drain(self):
+        """
+        Returns summary() and resets - e.g. for a worker process handing its metrics back to the parent
+        """
+        drained = self.summary()
+        self.reset()
+        return drained
+
+    def merge(self, summary):
+        """
+        Input: dict - a summary() / drain() of another Metrics (e.g. from a worker process)
+        """
+        self.records += summary["records"]
+        self.record_seconds += summary["record_seconds"]
+        for stage, totals in summary["stages"].items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + totals["seconds"]
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + totals["calls"]
+        for name, n in summary["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        for info in summary["slowest_records"]:
+            self._keep_if_slow(info)
+
+    def to_prometheus(self, prefix="faitheval"):
+        """
+        Returns str - metrics in the Prometheus text exposition format
+        """
+        lines = [
+            f"# HELP {prefix}_records_total Records scored.",
+            f"# TYPE {prefix}_records_total counter",
+            f"{prefix}_records_total {self.records}",
+            f"# HELP {prefix}_record_seconds_total Wall time spent scoring records.",
+            f"# TYPE {prefix}_record_seconds_total counter",
+            f"{prefix}_record_seconds_total {self.record_seconds:.6f}",
+            f"# HELP {prefix}_stage_seconds_total Wall time per scoring stage, excluding nested stages.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}' for stage, seconds in self.stage_seconds.items()]
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Timed sections per scoring stage.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        lines += [f'{prefix}_stage_calls_total{{stage="{stage}"}} {calls}' for stage, calls in self.stage_calls.items()]
+        for name, n in sorted(self.counters.items()):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {n}"]
+        return "\n".join(lines) + "\n"
+
+
+# process-wide instance used by faitheval modules
+metrics = Metrics()
+timer = metrics.timer
+increment = metrics.increment
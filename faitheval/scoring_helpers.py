@@ -1,11 +1,33 @@
+from itertools import chain
+
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 import faitheval.constants as constants
-from faitheval.utils import _simplify, _token_overlap_jaccard, get_entity_type_and_simplified_name, get_positive_relation
-from faitheval.embedding_helpers import _embed_entity, embed_triple
-from faitheval.graph_helpers import build_edge_index, build_adj_with_rel, find_paths
+from faitheval.utils import _simplify, _jaccard, _tokens, get_entity_type_and_simplified_name, get_positive_relation
+from faitheval.embedding_helpers import _embed_entity, _l2_normalize, embed_entities, embed_triple
+from faitheval.graph_helpers import RagGraph
 from faitheval.logging_config import logger
+from faitheval.instrumentation import increment
+
+def build_rag_graph(rag_triples_raw):
+    """
+    Inputs:
+        rag_triples_raw: List[(source, relation, target))]
+
+    Returns RagGraph (frozen) over simplified entity names, each entity typed from its raw text
+    """
+    rag_graph = RagGraph()
+
+    for s_raw, r, t_raw in rag_triples_raw:
+        s_simplified, s_type = get_entity_type_and_simplified_name(s_raw)
+        t_simplified, t_type = get_entity_type_and_simplified_name(t_raw)
+
+        rag_graph.add_entity(s_simplified, s_type, s_raw)
+        rag_graph.add_entity(t_simplified, t_type, t_raw)
+        rag_graph.add_edge(s_simplified, r, t_simplified)
+
+    return rag_graph.freeze()
+
 
 def prepare_rag_structures(rag_triples_raw):
     """
@@ -14,39 +36,33 @@ def prepare_rag_structures(rag_triples_raw):
     
     Returns:
         processed_triples_for_graph: List[(simplified_s, r, simplified_t)]
-        edge_idx: Dict[(simplified_s, simplified_t), relation_str]
-        adj: DefaultDict[simplified_s_str, List[(simplified_t_str, relation_str)]]
+        edge_idx: Mapping[(simplified_s, simplified_t), relation_str]
+        adj: Mapping[simplified_s_str, List[(simplified_t_str, relation_str)]] (missing sources give [])
         all_simplified_rag_entities_set: Set[simplified_entity_str]
-        rag_entity_details: Dict[simplified_entity_str, {"type": type_str, "raw": raw_text_str}]
-    """
-    rag_entity_details = {} 
-    processed_triples_for_graph = []
+        rag_entity_details: Mapping[simplified_entity_str, EntityRecord] (reads like {"type": type_str, "raw": raw_text_str})
 
-    for s_raw, r, t_raw in rag_triples_raw:
-        s_simplified, s_type = get_entity_type_and_simplified_name(s_raw)
-        t_simplified, t_type = get_entity_type_and_simplified_name(t_raw)
-        
-        processed_triples_for_graph.append((s_simplified, r, t_simplified))
-        
-        if s_simplified not in rag_entity_details:
-            rag_entity_details[s_simplified] = {"type": s_type, "raw": s_raw}
-        
-        if t_simplified not in rag_entity_details:
-           rag_entity_details[t_simplified] = {"type": t_type, "raw": t_raw}
-    
-    edge_idx = build_edge_index(processed_triples_for_graph)
-    adj = build_adj_with_rel(processed_triples_for_graph)
-    
-    all_simplified_rag_entities_set = set(rag_entity_details.keys())
-    
-    return processed_triples_for_graph, edge_idx, adj, all_simplified_rag_entities_set, rag_entity_details
+    Mappings are views over the interned RagGraph from build_rag_graph
+    """
+    rag_graph = build_rag_graph(rag_triples_raw)
+    return rag_graph.triples, rag_graph.edge_index, rag_graph.adjacency, rag_graph.entity_ids.keys(), rag_graph.entity_details
 
 
 def _cosine_sim(v1, v2):
-    return float(cosine_similarity(v1.reshape(1, -1), v2.reshape(1, -1))[0][0])
+    v1, v2 = _l2_normalize(np.stack([v1, v2]))
+    return float(v1 @ v2)
+
+
+def fuzzy_candidate_entities(all_simplified_rag_entities_set, rag_entity_details, strict_rag_types):
+    """
+    Returns List[str] - fuzzy candidate RAG entities (strict types left out), sorted for determinism
+    """
+    return sorted(
+        e_rag_s for e_rag_s in all_simplified_rag_entities_set
+        if rag_entity_details.get(e_rag_s, {}).get("type") not in strict_rag_types
+    )
 
 
-def fuzzy_match_entity(entity, all_simplified_rag_entities_set, rag_entity_details, strict_rag_types):
+def fuzzy_match_entity(entity, all_simplified_rag_entities_set, rag_entity_details, strict_rag_types, entity_index=None):
     """
     Inputs: 
         entity: str
@@ -55,6 +71,8 @@ def fuzzy_match_entity(entity, all_simplified_rag_entities_set, rag_entity_detai
                                               (e.g., {"type": "gene", "raw": "Gene RNF168"}).
         strict_rag_types: Set[str] - RAG entity types that should only be matched exactly 
                                     (e.g., constants.STRICT_RAG_ENTITY_TYPES).
+        entity_index: EntityIndex - optional index over the fuzzy candidates (inverted token index for Jaccard,
+                      candidates embedded on its first cosine lookup), used instead of the scans below
 
     Returns Set[str] - Subset of simplified RAG entity strings from all_simplified_rag_entities_set.
 
@@ -67,47 +85,63 @@ def fuzzy_match_entity(entity, all_simplified_rag_entities_set, rag_entity_detai
     entity_cot_simplified = _simplify(entity)
 
     # 1. exact string match
-    exact = {e for e in all_simplified_rag_entities_set if e == entity_cot_simplified}
-    if exact:
-        return exact
+    if entity_cot_simplified in all_simplified_rag_entities_set:
+        increment("entity_matches_exact")
+        return {entity_cot_simplified}
 
     #  prep for fuzzy matching, and don't allow strict types to be fuzzy match candidates
-    fuzzy_candidate_rag_entities = {
-        e_rag_s for e_rag_s in all_simplified_rag_entities_set
-        if rag_entity_details.get(e_rag_s, {}).get("type") not in strict_rag_types
-    }
+    if entity_index is not None:
+        fuzzy_candidate_rag_entities = entity_index.candidates
+    else:
+        fuzzy_candidate_rag_entities = fuzzy_candidate_entities(all_simplified_rag_entities_set, rag_entity_details, strict_rag_types)
+    if not fuzzy_candidate_rag_entities:
+        increment("entity_matches_none")
+        return set()
 
     # 2. Jaccard measure over threshold
-    jacc = {e for e in fuzzy_candidate_rag_entities if _token_overlap_jaccard(entity_cot_simplified, e) >= constants.ENT_JACC_THRESHOLD}
+    if entity_index is not None:
+        jacc = entity_index.jaccard_matches(entity_cot_simplified, constants.ENT_JACC_THRESHOLD)
+    else:
+        entity_cot_tokens = _tokens(entity_cot_simplified)
+        jacc = {e for e in fuzzy_candidate_rag_entities if _jaccard(entity_cot_tokens, _tokens(e)) >= constants.ENT_JACC_THRESHOLD}
     if jacc:
+        increment("entity_matches_jaccard")
         return jacc
 
-    # 3. embedding cosine similarity over threshold
-    entity_cot_embd = _embed_entity(entity_cot_simplified)
-    matches = set()
-    for e in fuzzy_candidate_rag_entities:
-        entity_rag_embd = _embed_entity(e)
-        if _cosine_sim(entity_cot_embd, entity_rag_embd)  >= constants.ENT_COS_THRESHOLD:
-            matches.add(e)
-    return matches
+    # 3. embedding cosine similarity over threshold - one matrix-vector product against all candidates
+    entity_cot_embd = _l2_normalize(_embed_entity(entity_cot_simplified))
+    if entity_index is not None:
+        matched = entity_index.cosine_matches(entity_cot_embd, constants.ENT_COS_THRESHOLD)
+    else:
+        cosine_sim_scores = embed_entities(fuzzy_candidate_rag_entities) @ entity_cot_embd
+        matched = {fuzzy_candidate_rag_entities[i] for i in np.flatnonzero(cosine_sim_scores >= constants.ENT_COS_THRESHOLD)}
+    increment("entity_matches_cosine" if matched else "entity_matches_none")
+    return matched
 
 
 #TODO: sentence embdg over relations istead of avging...
-def _path_similarity(cot_embd, path_rag):
+def _path_similarities(cot_embd, rag_triple_embds, edge_paths):
     """
     Inputs: 
-        cot_embd: np.ndarray
-        path: List[(source, relation, target)]
-    Returns mean cosine similarity between CoT triple embedding and every triple along the given path
+        cot_embd: np.ndarray - CoT triple embedding
+        rag_triple_embds: TripleEmbeddingMatrix - L2-normalized embeddings of the record's RAG triples, row i = edge id i
+        edge_paths: List[Tuple[edge_id, ...]] - from PathIndex.edge_paths
+    Returns np.ndarray - per path, mean cosine similarity between CoT triple embedding and every triple along it
+
+    All links of all paths are scored with one gather + one matrix-vector product, then averaged per path segment
     """
-    link_sim_scores = [
-        _cosine_sim(cot_embd, embed_triple((source, relation, target)))
-        for source, relation, target in path_rag
-    ]
-    return link_sim_scores
+    if not edge_paths:
+        return np.zeros(0)
+    path_lens = np.fromiter(map(len, edge_paths), dtype=np.intp, count=len(edge_paths))
+    link_edge_ids = np.fromiter(chain.from_iterable(edge_paths), dtype=np.intp, count=int(path_lens.sum()))
+    path_starts = np.zeros_like(path_lens)
+    np.cumsum(path_lens[:-1], out=path_starts[1:])
+
+    link_sim_scores = rag_triple_embds.rows(link_edge_ids) @ _l2_normalize(cot_embd.astype(np.float64))
+    return np.add.reduceat(link_sim_scores, path_starts) / path_lens
 
 
-def score_positive_triple(cot_embd, source_entities_rag, target_entities_rag, edge_idx, adj, cot_triple_raw, hallucination_recorder):
+def score_positive_triple(cot_embd, source_entities_rag, target_entities_rag, edge_idx, path_index, rag_triple_embds, cot_triple_raw, hallucination_recorder):
     best = 0.0
     found_evidence = False
     reason_for_zero = "No supporting evidence found in KG for positive CoT triple" # no edge/path above similarity thresholds
@@ -120,17 +154,16 @@ def score_positive_triple(cot_embd, source_entities_rag, target_entities_rag, ed
                     cosine_sim_score = _cosine_sim(cot_embd, embed_triple((pair[0], edge_idx[pair], pair[1])))
                     if cosine_sim_score >= constants.TRIPLE_SIM_THRESHOLD:
                         best = max(best, cosine_sim_score)
-                        logger.info(f"Positive CoT triple: Found direct edge: ({pair[0]}, {edge_idx[pair]}, {pair[1]})")
+                        logger.info("Positive CoT triple: Found direct edge: (%s, %s, %s)", pair[0], edge_idx[pair], pair[1])
                         found_evidence = True
             # look for paths
-            for path in find_paths(adj, s, t, constants.MAX_PATH_LEN):
-                #TODO: sentence embdg over relations istead of avging...
-                link_sim_scores = _path_similarity(cot_embd, path)
-                path_avg_sim_score = float(np.mean(link_sim_scores))
-                if path_avg_sim_score >= constants.TRIPLE_SIM_THRESHOLD:
-                    best = max(best, path_avg_sim_score)
-                    logger.info(f"Positive CoT triple: Found path between: ({s}, {t}) in KG with averaged cosine sim score = {path_avg_sim_score:.3f}")
-                    found_evidence = True
+            #TODO: sentence embdg over relations istead of avging...
+            path_avg_sim_scores = _path_similarities(cot_embd, rag_triple_embds, path_index.edge_paths(s, t))
+            supporting = path_avg_sim_scores[path_avg_sim_scores >= constants.TRIPLE_SIM_THRESHOLD]
+            if supporting.size:
+                best = max(best, float(supporting.max()))
+                logger.info("Positive CoT triple: Found %d paths between: (%s, %s) in KG with averaged cosine sim score up to %.3f", supporting.size, s, t, supporting.max())
+                found_evidence = True
     
     if not found_evidence:
         logger.info(reason_for_zero)
@@ -144,7 +177,7 @@ def score_positive_triple(cot_embd, source_entities_rag, target_entities_rag, ed
     return best
 
 
-def score_negative_triple(source_entities_rag, target_entities_rag, edge_idx, adj, cot_triple_raw, hallucination_recorder):
+def score_negative_triple(source_entities_rag, target_entities_rag, edge_idx, path_index, rag_triple_embds, cot_triple_raw, hallucination_recorder):
     s_cot_raw, rel_cot_negative, t_cot_raw = cot_triple_raw
     rel_cot_positive = get_positive_relation(rel_cot_negative)
     cot_positive_form_embd = embed_triple((s_cot_raw, rel_cot_positive, t_cot_raw))
@@ -152,9 +185,12 @@ def score_negative_triple(source_entities_rag, target_entities_rag, edge_idx, ad
     # if edge/path actually exists in KG, it contradicts negation stated in CoT - hallucination
     for s in source_entities_rag:
         for t in target_entities_rag:
-            for path in find_paths(adj, s, t, constants.MAX_PATH_LEN):
-                path_avg_sim_score = round(float(np.mean(_path_similarity(cot_positive_form_embd, path))), 3)
-            
+            # first path found (shortest) decides
+            edge_paths = path_index.edge_paths(s, t)[:1]
+            if edge_paths:
+                path = [path_index.graph.triple(e) for e in edge_paths[0]]
+                path_avg_sim_score = round(float(_path_similarities(cot_positive_form_embd, rag_triple_embds, edge_paths)[0]), 3)
+
                 if path_avg_sim_score >= constants.TRIPLE_SIM_THRESHOLD:
                     reason = f"Negative triple in CoT: Contradicted by path in KG: ({path})"
                     logger.info(reason)
@@ -217,10 +253,10 @@ def score_negative_triple(source_entities_rag, target_entities_rag, edge_idx, ad
     entity2_in_kg = bool(target_entities_rag)
 
     if entity1_in_kg and entity2_in_kg:
-        logger.info(f"Negative triple in CoT: Found both entities in KG, link absent: ({source_entities_rag}, {target_entities_rag})")
+        logger.info("Negative triple in CoT: Found both entities in KG, link absent: (%s, %s)", source_entities_rag, target_entities_rag)
         score = 1.0
     elif entity1_in_kg or entity2_in_kg:
-        logger.info(f"Negative triple in CoT: Found only one entity in KG: ({source_entities_rag}, {target_entities_rag})")
+        logger.info("Negative triple in CoT: Found only one entity in KG: (%s, %s)", source_entities_rag, target_entities_rag)
         score = constants.NEG_TRIPLE_ONE_ENTITY_SCORE
     else:
         reason = "Negative triple in CoT: Both entities absent from KG"
@@ -1,10 +1,16 @@
 import re
+from functools import lru_cache
 import faitheval.constants as constants # only need kg-dependent ones
 
 _NEG_REGEX = re.compile(r"\bnot\b|\bno\b", flags=re.I)  # to detect negative relations
 _SIMPLIFY_REGEX = re.compile(r"\b(?:gene|disease|mutations?)\b", flags=re.I) # removing stopwords...
+_PUNCT_REGEX = re.compile(r"[^\w\s]")
+_WHITESPACE_REGEX = re.compile(r"\s+")
+# one pass over all type prefixes - alternatives keep ENTITY_TYPE_PREFIX_MAP order, so the first listed prefix wins like before
+_ENTITY_TYPE_PREFIX_REGEX = re.compile("|".join(re.escape(prefix) for prefix in constants.ENTITY_TYPE_PREFIX_MAP))
 
 
+@lru_cache(maxsize=constants.NORMALIZATION_CACHE_SIZE)
 def _simplify(text):
     """
     Input: string
@@ -13,8 +19,8 @@ def _simplify(text):
     Returns simplified string
     """
     text = _SIMPLIFY_REGEX.sub("", text)
-    text = re.sub(r"[^\w\s]", " ", text)
-    return re.sub(r"\s+", " ", text).strip().lower()
+    text = _PUNCT_REGEX.sub(" ", text)
+    return _WHITESPACE_REGEX.sub(" ", text).strip().lower()
 
 
 def _tokens(text):
@@ -25,16 +31,22 @@ def _tokens(text):
     return set(_simplify(text).split())
 
 
-def _token_overlap_jaccard(a, b):
+def _jaccard(ta, tb):
     """
-    Calculate Jaccard measure (token overlap) between 2 input strings a and b
+    Jaccard measure between 2 token sets
     """
-    ta, tb = _tokens(a), _tokens(b)
     if not ta or not tb:
         return 0.0
     return len(ta & tb) / len(ta | tb)
 
 
+def _token_overlap_jaccard(a, b):
+    """
+    Calculate Jaccard measure (token overlap) between 2 input strings a and b
+    """
+    return _jaccard(_tokens(a), _tokens(b))
+
+
 def is_negative_relation(relation):
     """
     Detect negation - reflects presence of words 'no' or 'not' in input string
@@ -54,6 +66,7 @@ def get_positive_relation(negative_relation_str):
     return positive_form
 
 
+@lru_cache(maxsize=constants.NORMALIZATION_CACHE_SIZE)
 def get_entity_type_and_simplified_name(raw_entity_text):
     """
     Determines entity type from raw_entity_text based on prefixes defined in 
@@ -65,13 +78,18 @@ def get_entity_type_and_simplified_name(raw_entity_text):
     Returns:
         tuple(str, str) - (simplified_name, entity_type)
     """
-    raw_lower = raw_entity_text.lower()
-    entity_type = constants.DEFAULT_ENTITY_TYPE
+    prefix_match = _ENTITY_TYPE_PREFIX_REGEX.match(raw_entity_text.lower())
+    entity_type = constants.ENTITY_TYPE_PREFIX_MAP[prefix_match.group()] if prefix_match else constants.DEFAULT_ENTITY_TYPE
 
-    for prefix, type_name in constants.ENTITY_TYPE_PREFIX_MAP.items():
-        if raw_lower.startswith(prefix):
-            entity_type = type_name
-            break 
-    
     simplified_name = _simplify(raw_entity_text) # _simplify uses _SIMPLIFY_REGEX
     return simplified_name, entity_type
+
+
+def normalization_cache_stats():
+    """
+    Returns dict - hits / misses / maxsize / currsize of the memoized _simplify and get_entity_type_and_simplified_name
+    """
+    return {
+        "simplify": _simplify.cache_info()._asdict(),
+        "entity_type": get_entity_type_and_simplified_name.cache_info()._asdict(),
+    }
@@ -2,12 +2,15 @@ from groq import Groq
 import logging
 import json
 
+from llm.response_cache import get_response_cache, request_key
+
 class GroqClient:
     def __init__(self, config):
         self.client = Groq(api_key=config.GROQ_API_KEY)
         self.logger = logging.getLogger("groq_logger")
         self.logger.setLevel(logging.INFO)
         self.config = config
+        self.cache = get_response_cache()
 
         if not self.logger.handlers:
             file_handler = logging.FileHandler("logs/groq_responses.log")
@@ -15,9 +18,21 @@ class GroqClient:
             file_handler.setFormatter(formatter)
             self.logger.addHandler(file_handler)
 
+    def _cache_lookup(self, method, request):
+        """
+        Returns (cache key, cached response text or None) - key is None when caching is disabled
+        """
+        if self.cache is None:
+            return None, None
+        key = request_key("groq", self.client.base_url, method, request)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.logger.info(f"Cache hit for {method} request {key}")
+        return key, cached
+
     def generate_response(self, instructions, input_text):
         try:
-            response = self.client.chat.completions.create(
+            request = dict(
                 model=self.config.MODEL_NAME,
                 messages=[
                     {"role": "system", "content": instructions},
@@ -26,8 +41,15 @@ class GroqClient:
                 temperature=getattr(self.config, "TEMPERATURE", 0.2),
                 max_tokens=getattr(self.config, "MAX_TOKENS", 1024)
             )
+            key, cached = self._cache_lookup("generate_response", request)
+            if cached is not None:
+                return cached
+
+            response = self.client.chat.completions.create(**request)
             output_text = response.choices[0].message.content
             self._log_response(instructions, input_text, output_text)
+            if key is not None:
+                self.cache.set(key, output_text)
             return output_text
         except Exception as e:
             self.logger.error(f"Groq API call failed: {e}")
@@ -36,7 +58,7 @@ class GroqClient:
     def generate_json_response(self, instructions, input_text, text_data: dict):
         try:
             user_prompt = f"{input_text}\n\nRespond ONLY in valid JSON format as specified in the schema."
-            response = self.client.chat.completions.create(
+            request = dict(
                 model=self.config.MODEL_NAME,
                 messages=[
                     {"role": "system", "content": instructions},
@@ -45,12 +67,18 @@ class GroqClient:
                 temperature=getattr(self.config, "TEMPERATURE", 0.2),
                 max_tokens=getattr(self.config, "MAX_TOKENS", 1024)
             )
-            output_text = response.choices[0].message.content
+            # schema is only described in the prompt, but is part of the request identity
+            key, output_text = self._cache_lookup("generate_json_response", request | {"text": text_data})
+            if output_text is None:
+                response = self.client.chat.completions.create(**request)
+                output_text = response.choices[0].message.content
+                self._log_response(instructions, input_text, output_text)
+                if key is not None:
+                    self.cache.set(key, output_text)
             try:
                 response_data = json.loads(output_text)
             except Exception:
                 response_data = {"raw_output": output_text}
-            self._log_response(instructions, input_text, output_text)
             return response_data
         except Exception as e:
             self.logger.error(f"Groq API call failed: {e}")
@@ -1,32 +1,80 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError
 # from config.config import config
+import asyncio
 import logging
 import json
+import random
 
-class OpenAIClient:
+from llm.rate_limiter import AsyncTokenBucket
+from llm.response_cache import get_response_cache, request_key
+
+
+def _get_logger():
+	logger = logging.getLogger("openai_logger")
+	logger.setLevel(logging.INFO)
+
+	if not logger.handlers:
+		file_handler = logging.FileHandler("logs/llm_responses.log")
+		formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+		file_handler.setFormatter(formatter)
+		logger.addHandler(file_handler)
+	return logger
+
+
+class _OpenAIClientBase:
+	"""
+	Response cache lookup and response logging shared by the sync and async clients
+	(subclasses set self.client, self.config, self.logger and self.cache)
+	"""
+
+	def _cache_lookup(self, method, request):
+		"""
+		Returns (cache key, cached response text or None) - key is None when caching is disabled
+		"""
+		if self.cache is None:
+			return None, None
+		key = request_key("openai", self.client.base_url, method, request)
+		cached = self.cache.get(key)
+		if cached is not None:
+			self.logger.info(f"Cache hit for {method} request {key}")
+		return key, cached
+
+
+	def _log_response(self, instructions, input_text, response):
+		log_data = {
+			"model": self.config.MODEL_NAME,
+			"instructions": instructions,
+			"input_text": input_text,
+			"response": response.output_text
+		}
+		self.logger.info(json.dumps(log_data, indent=4))
+
+
+class OpenAIClient(_OpenAIClientBase):
 	def __init__(self, config):
-		self.client = OpenAI(api_key=config.OPENAI_API_KEY)
-		self.logger = logging.getLogger("openai_logger")
-		self.logger.setLevel(logging.INFO)
+		self.client = OpenAI(api_key=config.OPENAI_API_KEY, base_url=config.OPENAI_BASE_URL)
+		self.logger = _get_logger()
 		self.config = config
-
-		if not self.logger.handlers:
-			file_handler = logging.FileHandler("logs/llm_responses.log")
-			formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-			file_handler.setFormatter(formatter)
-			self.logger.addHandler(file_handler)
+		self.cache = get_response_cache()
 
 
 	def generate_response(self, instructions, input_text):
 		try:
-			response = self.client.responses.create(
+			request = dict(
 				model = self.config.MODEL_NAME,
 				instructions = instructions,
 				input = input_text
 			)
+			key, cached = self._cache_lookup("generate_response", request)
+			if cached is not None:
+				return cached
+
+			response = self.client.responses.create(**request)
 
 			self._log_response(instructions, input_text, response)
 
+			if key is not None:
+				self.cache.set(key, response.output_text)
 			return response.output_text
 		
 		except Exception as e:
@@ -36,7 +84,7 @@ class OpenAIClient:
 			
 	def generate_json_response(self, instructions, input_text, text_data: dict):
 		try:
-			response = self.client.responses.create(
+			request = dict(
 				model = self.config.MODEL_NAME,
 				input = [
 					{
@@ -50,25 +98,97 @@ class OpenAIClient:
 				],
 				text = text_data
 			)
+			key, cached = self._cache_lookup("generate_json_response", request)
+			if cached is not None:
+				return json.loads(cached)
+
+			response = self.client.responses.create(**request)
 
 			response_text = response.output_text
 			response_data = json.loads(response_text)
 
 			self._log_response(instructions, input_text, response)
 
+			if key is not None:
+				self.cache.set(key, response_text)
 			return response_data
 
 		except Exception as e:
 			self.logger.error(f"OpenAI API call failed: {e}")
 			return "Error generating response."
-		
-	
-	def _log_response(self, instructions, input_text, response):
-		log_data = {
-			"model": self.config.MODEL_NAME,
-			"instructions": instructions,
-			"input_text": input_text,
-			"response": response.output_text
-		}
-		self.logger.info(json.dumps(log_data, indent=4))
-		
\ No newline at end of file
+
+
+def _is_retryable(error):
+	"""
+	429 (rate limit), 5xx and connection/timeout errors are worth retrying, other API errors are not
+	"""
+	if isinstance(error, APIStatusError):
+		return error.status_code == 429 or error.status_code >= 500
+	return isinstance(error, APIConnectionError)
+
+
+def _retry_after(error):
+	"""
+	Seconds requested by the server's Retry-After header, if any
+	"""
+	response = getattr(error, "response", None)
+	try:
+		return float(response.headers["retry-after"])
+	except (AttributeError, KeyError, TypeError, ValueError):
+		return None
+
+
+class AsyncOpenAIClient(_OpenAIClientBase):
+	"""
+	asyncio counterpart of OpenAIClient for concurrent batch jobs: at most `concurrency` requests in flight,
+	started at no more than `requests_per_second`, retried with exponential backoff on 429/5xx/connection errors.
+	"""
+
+	def __init__(self, config, concurrency=8, requests_per_second=0):
+		# retries are handled here (backoff + rate limiting), not by the SDK
+		self.client = AsyncOpenAI(api_key=config.OPENAI_API_KEY, base_url=config.OPENAI_BASE_URL, max_retries=0)
+		self.config = config
+		self.max_retries = getattr(config, "LLM_MAX_RETRIES", 5)
+		self.retry_base_delay = getattr(config, "LLM_RETRY_BASE_DELAY", 1.0)
+		self.semaphore = asyncio.Semaphore(concurrency)
+		self.rate_limiter = AsyncTokenBucket(requests_per_second)
+		self.logger = _get_logger()
+		self.cache = get_response_cache()
+
+
+	async def _create(self, **request):
+		for attempt in range(self.max_retries + 1):
+			await self.rate_limiter.acquire()
+			try:
+				async with self.semaphore:
+					return await self.client.responses.create(**request)
+			except Exception as e:
+				if attempt == self.max_retries or not _is_retryable(e):
+					raise
+				delay = _retry_after(e) or self.retry_base_delay * (2 ** attempt) * (1 + random.random())
+				self.logger.warning(f"OpenAI API call failed ({e}), retrying in {delay:.1f}s")
+				await asyncio.sleep(delay)
+
+
+	async def generate_response(self, instructions, input_text):
+		try:
+			request = dict(
+				model = self.config.MODEL_NAME,
+				instructions = instructions,
+				input = input_text
+			)
+			key, cached = self._cache_lookup("generate_response", request)
+			if cached is not None:
+				return cached
+
+			response = await self._create(**request)
+
+			self._log_response(instructions, input_text, response)
+
+			if key is not None:
+				self.cache.set(key, response.output_text)
+			return response.output_text
+
+		except Exception as e:
+			self.logger.error(f"OpenAI API call failed: {e}")
+			return "Error generating response."
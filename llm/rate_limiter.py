@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+
+class AsyncTokenBucket:
+	"""
+	Token-bucket rate limiter for asyncio code: tokens refill at `rate` per second up to `capacity`,
+	each request takes one token and waits while the bucket is empty.
+	"""
+
+	def __init__(self, rate: float, capacity: int = None):
+		self.rate = rate
+		self.capacity = capacity if capacity is not None else max(1, int(rate))
+		self._tokens = float(self.capacity)
+		self._last_refill = time.monotonic()
+		self._lock = asyncio.Lock()
+
+	def _refill(self):
+		now = time.monotonic()
+		self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+		self._last_refill = now
+
+	async def acquire(self):
+		if self.rate <= 0:
+			return
+		async with self._lock:
+			self._refill()
+			while self._tokens < 1:
+				await asyncio.sleep((1 - self._tokens) / self.rate)
+				self._refill()
+			self._tokens -= 1
@@ -0,0 +1,22 @@
+from config.config import Config
+from utils.sqlite_cache import SQLiteCache, make_cache_key
+
+_cache = None
+
+
+def get_response_cache():
+	"""
+	Process-wide LLM response cache shared by all clients, None if disabled (LLM_CACHE_PATH set to empty)
+	"""
+	global _cache
+	if _cache is None and Config.LLM_CACHE_PATH:
+		_cache = SQLiteCache(Config.LLM_CACHE_PATH, max_entries=Config.LLM_CACHE_MAX_ENTRIES)
+	return _cache
+
+
+def request_key(provider, base_url, method, request):
+	"""
+	Content address of a full LLM request - provider, API endpoint (so responses of e.g. a local stub server never
+	reach runs against the real API), client method and every request parameter (model, instructions, input, schema, ...)
+	"""
+	return make_cache_key({"provider": provider, "base_url": str(base_url), "method": method, "request": request})
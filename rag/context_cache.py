@@ -0,0 +1,65 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils.sqlite_cache import make_cache_key
+
+
+class ContextEmbeddingStore:
+    """
+    Per-node sentence embeddings of SPOKE context, persisted as one .npz file per
+    (node name, SPOKE query parameters, embedding model).
+
+    The sentences are identical for every question touching the node, so only the question needs embedding.
+    A digest of the sentences is stored with the embeddings - if SPOKE returns different context, it is re-embedded.
+    """
+
+    def __init__(self, cache_dir, model_name):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, node, context_params):
+        key = make_cache_key({"node": node, "params": context_params, "model": self.model_name})
+        return self.dir / f"{key}.npz"
+
+    @staticmethod
+    def _digest(sentences):
+        return hashlib.sha256("\n".join(sentences).encode("utf-8")).hexdigest()
+
+    def get(self, node, context_params, sentences):
+        """
+        Returns np.ndarray (len(sentences), dim) or None if not stored or stored for different sentences
+        """
+        path = self._path(node, context_params)
+        try:
+            with np.load(path) as stored:
+                if str(stored["digest"]) == self._digest(sentences):
+                    self.hits += 1
+                    return stored["embeddings"]
+        except (OSError, KeyError, ValueError):
+            pass
+        self.misses += 1
+        return None
+
+    def put(self, node, context_params, sentences, embeddings):
+        path = self._path(node, context_params)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, embeddings=np.asarray(embeddings, dtype=np.float32), digest=np.array(self._digest(sentences)))
+        os.replace(tmp_path, path)
+
+    def get_or_embed(self, node, context_params, sentences, embedding_function):
+        """
+        Stored embeddings for the node's sentences, embedding (and storing) them on a miss
+        """
+        embeddings = self.get(node, context_params, sentences)
+        if embeddings is None:
+            embeddings = np.asarray(embedding_function.embed_documents(sentences), dtype=np.float32)
+            self.put(node, context_params, sentences, embeddings)
+        return embeddings
@@ -1,46 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from rag.utils import *
+from rag.context_cache import ContextEmbeddingStore
 from config.config import config_mini as config
 
 class RAG:
     def __init__(self, openai_client, spoke_api_client, context_volume, context_similarity_percentile_threshold, context_similarity_min_threshold):
         self.openai_client = openai_client
         self.spoke_api_client = spoke_api_client
-        self.embedding_function = get_embedding_function(model_name=config.EMBEDDING_MODEL_FOR_CONTEXT_RETRIEVAL)
+        # shared by the retrieval threads below and by batch callers
+        self.embedding_function = LockedEmbeddings(get_embedding_function(model_name=config.EMBEDDING_MODEL_FOR_CONTEXT_RETRIEVAL))
         self.vector_store = get_vector_store(vector_db_path=config.VECTOR_DB_PATH, sentence_embedding_model=config.VECTOR_DB_SENTENCE_EMBEDDING_MODEL)
         self.context_volume = context_volume
         self.context_similarity_percentile_threshold = context_similarity_percentile_threshold
         self.context_similarity_min_threshold = context_similarity_min_threshold
+        self.context_embedding_store = ContextEmbeddingStore(
+            config.CONTEXT_EMBEDDING_CACHE_PATH, config.EMBEDDING_MODEL_FOR_CONTEXT_RETRIEVAL
+        ) if config.CONTEXT_EMBEDDING_CACHE_PATH else None
+        # per-node SPOKE fetch + pruning runs here, bounded so SPOKE is not flooded
+        self.executor = ThreadPoolExecutor(max_workers=config.RAG_MAX_WORKERS)
+
+
+    def lookup_nodes(self, disease_entities):
+        """
+        Best matching disease node for every extracted entity - one batched vector DB query for all of them
+        """
+        entity_embeddings = self.vector_store.embeddings.embed_documents(disease_entities)
+        # langchain's Chroma searches one query vector per call - the underlying chromadb collection takes them all at once
+        results = self.vector_store._collection.query(query_embeddings=entity_embeddings, n_results=1, include=["documents"])
+        return [documents[0] for documents in results["documents"]]
+
+
+    def _retrieve_node_context(self, node, question_embedding, max_count):
+        """
+        SPOKE context of one node, pruned to the sentences most similar to the question
+        """
+        node_context, context_table = self.spoke_api_client.get_context(node)
+        node_context_embeddings = None
+        if self.context_embedding_store is not None:
+            node_context_embeddings = self.context_embedding_store.get_or_embed(
+                node, self.spoke_api_client.get_context_params(), split_context(node_context), self.embedding_function
+            )
+        relevant_context = extract_relevant_context(
+            node_context=node_context,
+            question_embedding=question_embedding,
+            embedding_function=self.embedding_function,
+            percentile_threshold=self.context_similarity_percentile_threshold,
+            min_threshold=self.context_similarity_min_threshold,
+            max_count=max_count,
+            node_context_embeddings=node_context_embeddings
+        )
+        return relevant_context, context_table
 
     
-    def retrieve(self, question):
-        disease_entities = extract_disease_entities(question, self.openai_client)
-        question_embedding = get_text_embedding(question, self.embedding_function)
-        nodes_found = []
-        node_context_extracted = ""
-        max_number_of_high_similarity_context_per_node = 0
+    def find_nodes(self, question):
+        """
+        SPOKE disease nodes for a question - from its extracted disease entities, else the nearest nodes to the question
 
+        Returns (List[str] node names, max number of high similarity context sentences per node)
+        """
+        disease_entities = extract_disease_entities(question, self.openai_client)
         if disease_entities:
-            max_number_of_high_similarity_context_per_node = int(self.context_volume/len(disease_entities))
-            for disease in disease_entities:
-                node_search_result = self.vector_store.similarity_search_with_score(disease, k=1)
-                nodes_found.append(node_search_result[0][0].page_content)
-        else:
-            k = 5
-            nodes_found = self.vector_store.similarity_search_with_score(question, k=k)
-            max_number_of_high_similarity_context_per_node = int(self.context_volume/k)
-        context_tables=[]
-        for node in nodes_found:
-            node_context, context_table = self.spoke_api_client.get_context(node)
-            context_tables.append(context_table)
-            relevant_context = extract_relevant_context(
-                node_context=node_context,
-                question_embedding=question_embedding,
-                embedding_function=self.embedding_function,
-                percentile_threshold=self.context_similarity_percentile_threshold,
-                min_threshold=self.context_similarity_min_threshold,
-                max_count=max_number_of_high_similarity_context_per_node
-            )
+            return self.lookup_nodes(disease_entities), int(self.context_volume/len(disease_entities))
+        k = 5
+        nodes_found = [document.page_content for document, _ in self.vector_store.similarity_search_with_score(question, k=k)]
+        return nodes_found, int(self.context_volume/k)
+
+
+    def retrieve(self, question, question_embedding=None):
+        nodes_found, max_number_of_high_similarity_context_per_node = self.find_nodes(question)
+        if question_embedding is None:
+            question_embedding = get_text_embedding(question, self.embedding_function)
 
-            node_context_extracted += relevant_context
+        # fan out per node - map keeps the node order, so the context is assembled deterministically
+        node_results = list(self.executor.map(
+            lambda node: self._retrieve_node_context(node, question_embedding, max_number_of_high_similarity_context_per_node),
+            nodes_found
+        ))
+        node_context_extracted = "".join(relevant_context for relevant_context, _ in node_results)
+        context_tables = [context_table for _, context_table in node_results]
 
-        return node_context_extracted, context_tables
\ No newline at end of file
+        return node_context_extracted, context_tables
@@ -5,7 +5,7 @@ from utils.schema_loader import load_task_schema
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import threading
 
 
 def extract_disease_entities(text: str, client: OpenAIClient):
@@ -22,41 +22,77 @@ def get_embedding_function(model_name):
     return HuggingFaceEmbeddings(model_name=model_name)
 
 
+class LockedEmbeddings:
+    """
+    Embedding function safe to share between threads - calls into the wrapped model are serialized
+    (HuggingFace fast tokenizers raise "Already borrowed" when used concurrently)
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+
+    def embed_query(self, text):
+        with self._lock:
+            return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts):
+        with self._lock:
+            return self.embeddings.embed_documents(texts)
+
+
 def get_text_embedding(text, embedding_function):
     return embedding_function.embed_query(text)
 
 
 def get_vector_store(vector_db_path, sentence_embedding_model):
-    embedding_function = get_embedding_function(model_name=sentence_embedding_model)
+    embedding_function = LockedEmbeddings(get_embedding_function(model_name=sentence_embedding_model))
     return Chroma(embedding_function=embedding_function, persist_directory=vector_db_path)
 
 
 def calculate_similarities(question_embedding, node_context_embeddings):
-    similarities = [
-        cosine_similarity(np.array(question_embedding).reshape(1, -1), np.array(node_context_embedding).reshape(1, -1))
-        for node_context_embedding in node_context_embeddings
-    ]
-    return [s[0][0] for s in similarities]
+    """
+    Cosine similarity of every context sentence to the question - one normalized matrix-vector product
+    """
+    question_embedding = np.asarray(question_embedding, dtype=np.float32)
+    node_context_embeddings = np.asarray(node_context_embeddings, dtype=np.float32).reshape(-1, question_embedding.shape[0])
+
+    question_norm = np.linalg.norm(question_embedding)
+    context_norms = np.linalg.norm(node_context_embeddings, axis=1)
+    context_norms[context_norms == 0] = 1.0
+    if question_norm == 0:
+        return np.zeros(len(node_context_embeddings), dtype=np.float32)
+    return (node_context_embeddings @ (question_embedding / question_norm)) / context_norms
 
 
 def filter_high_similarity_indices(similarities, percentile_threshold, min_threshold, max_count):
-    sorted_indices = np.argsort(similarities)[::-1]
+    """
+    Indices of the (at most max_count) most similar sentences above both the percentile and the minimum threshold,
+    most similar first - top-k via argpartition, only the selected k are sorted
+    """
+    similarities = np.asarray(similarities)
+    if max_count <= 0 or similarities.size == 0:
+        return []
+
     percentile_threshold_value = np.percentile(similarities, percentile_threshold)
-    
-    high_similarity_indices = [
-        i for i in sorted_indices
-        if similarities[i] > percentile_threshold_value and similarities[i] > min_threshold
-    ]
+    high_similarity_indices = np.flatnonzero((similarities > percentile_threshold_value) & (similarities > min_threshold))
 
     if len(high_similarity_indices) > max_count:
-        high_similarity_indices = high_similarity_indices[:max_count]
+        top_k = np.argpartition(-similarities[high_similarity_indices], max_count - 1)[:max_count]
+        high_similarity_indices = high_similarity_indices[top_k]
+
+    order = np.argsort(-similarities[high_similarity_indices], kind="stable")
+    return high_similarity_indices[order].tolist()
+
 
-    return high_similarity_indices
+def split_context(node_context):
+    return node_context.split(". ")
 
 
-def extract_relevant_context(node_context, question_embedding, embedding_function, percentile_threshold=90, min_threshold=0.5, max_count=3):
-    node_context_list = node_context.split(". ")
-    node_context_embeddings = embedding_function.embed_documents(node_context_list)
+def extract_relevant_context(node_context, question_embedding, embedding_function, percentile_threshold=90, min_threshold=0.5, max_count=3, node_context_embeddings=None):
+    node_context_list = split_context(node_context)
+    if node_context_embeddings is None:
+        node_context_embeddings = embedding_function.embed_documents(node_context_list)
 
     similarities = calculate_similarities(question_embedding, node_context_embeddings)
     high_similarity_indices = filter_high_similarity_indices(similarities, percentile_threshold, min_threshold, max_count)
@@ -1,6 +1,6 @@
 from config.config import config_mini
 import os
-from vectorDB.create_vectordb import create_vector_db, create_vector_db_no_batching
+from vectorDB.create_vectordb import create_vector_db
 import time
 
 
@@ -9,13 +9,11 @@ if not os.path.exists("logs"):
     
 
 try:
-    if os.path.exists(config_mini.VECTOR_DB_PATH):
-        print("VectorDB already exists.")
-    else:
-        start_time = time.time()
-        create_vector_db()
-        batched_time = time.time() - start_time
-        print(f"Time taken to create VectorDB: {batched_time:.2f} seconds")
+    # incremental - only chunks not in the VectorDB yet are embedded, a complete one built from the same data returns at once
+    start_time = time.time()
+    create_vector_db()
+    batched_time = time.time() - start_time
+    print(f"Time taken to create VectorDB: {batched_time:.2f} seconds")
 
 except:
     print("VectorDB creation could not be completed.")
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Parsing of SPOKE neighborhood responses into the textual context and context table used by RAG.
+
+parse_context walks the JSON once, collecting edge columns and a node id -> "Type name" dict, and joins edges to
+node names with dict lookups instead of DataFrame merges. The pandas merge version (_merge_context_frames) is kept
+for the rare responses where a plain dict join would not give the same table: a node id listed more than once,
+or a node name that is not a string.
+"""
+import ast
+import json
+
+import pandas as pd
+
+CONTEXT_COLUMNS = ["source", "edge_type", "target", "provenance", "evidence", "predicate", "context"]
+_ISB_PROVENANCE = "Based on data from Institute For Systems Biology (ISB)"
+
+
+def _node_name(neo_type, properties):
+    try:
+        return properties["description"] if neo_type == "Protein" else properties["name"]
+    except Exception:
+        return properties["identifier"]
+
+
+def _literal_list(value):
+    """
+    ast.literal_eval of a stored list string (e.g. "['123', '456']") - strings without escapes take a json.loads
+    fast path, a single-quoted Python repr is read as JSON once its quotes are swapped
+    """
+    if value == "[]":
+        return []
+    if isinstance(value, str) and "\\" not in value:
+        if "'" in value and '"' not in value:
+            value_json = value.replace("'", '"')
+        else:
+            value_json = value
+        try:
+            parsed = json.loads(value_json)
+        except ValueError:
+            parsed = None
+        # only lists of strings are guaranteed to read the same as a Python literal
+        if isinstance(parsed, list) and all(isinstance(x, str) for x in parsed):
+            return parsed
+    return ast.literal_eval(value)
+
+
+def _extract_provenance(props):
+    """
+    Evidence sources of an edge: "sources" list, else "source", else preprint DOIs / PubMed ids, else "SPOKE-KG"
+    """
+    try:
+        return ", ".join(props["sources"])
+    except Exception:
+        pass
+    try:
+        source = props["source"]
+        return ", ".join(source) if isinstance(source, list) else source
+    except Exception:
+        pass
+    try:
+        preprint_list = _literal_list(props.get("preprint_list", "[]"))
+        if preprint_list:
+            return ", ".join(preprint_list)
+        pmid_list = ["pubmedId:" + x for x in _literal_list(props.get("pmid_list", "[]"))]
+        return ", ".join(pmid_list) if pmid_list else _ISB_PROVENANCE
+    except Exception:
+        return "SPOKE-KG"
+
+
+def _merge_context_frames(neighbour_nodes, neighbour_edges):
+    """
+    Context table via pandas merges - handles repeated node ids (one row per match) and non-string node names
+    """
+    nodes_df = pd.DataFrame(neighbour_nodes, columns=["node_type", "node_id", "node_name"])
+    edges_df = pd.DataFrame(neighbour_edges, columns=["source", "edge_type", "target", "provenance", "evidence"])
+
+    merged = edges_df
+    for column in ["source", "target"]:
+        merged = pd.merge(merged, nodes_df, left_on=column, right_on="node_id").drop("node_id", axis=1)
+        merged[column + "_name"] = merged["node_type"] + " " + merged["node_name"]
+        merged = merged.drop([column, "node_type", "node_name"], axis=1).rename(columns={column + "_name": column})
+
+    final_df = merged[["source", "edge_type", "target", "provenance", "evidence"]].copy()
+    final_df.loc[:, "predicate"] = final_df["edge_type"].apply(lambda x: x.split("_")[0])
+    final_df.loc[:, "context"] = final_df["source"] + " " + final_df["predicate"].str.lower() + " " + final_df["target"] + "."
+    return final_df
+
+
+def parse_context(node, node_context):
+    """
+    Inputs:
+        node: str - queried disease name
+        node_context: List[dict] - neighborhood JSON from SPOKE, first item is the queried disease node
+    Returns (combined context string, DataFrame with columns CONTEXT_COLUMNS - one row per edge whose endpoints are both listed)
+    """
+    neighbour_nodes = []    # (node_type, node_id, node_name)
+    node_labels = {}        # node_id -> "Type name"
+    edge_sources, edge_types, edge_targets, provenances, evidences = [], [], [], [], []
+    needs_merge = False
+
+    for item in node_context:
+        data = item["data"]
+        neo_type = data["neo4j_type"]
+
+        if "_" not in neo_type:
+            name = _node_name(neo_type, data["properties"])
+            node_id = data["id"]
+            neighbour_nodes.append((neo_type, node_id, name))
+            if node_id in node_labels or not isinstance(name, str):
+                needs_merge = True
+            else:
+                node_labels[node_id] = neo_type + " " + name
+        else:
+            edge_sources.append(data["source"])
+            edge_types.append(neo_type)
+            edge_targets.append(data["target"])
+            provenances.append(_extract_provenance(data["properties"]))
+            evidences.append(data.get("properties", None))
+
+    # inner join on both endpoints, in edge order
+    kept = [
+        i for i, (s, t) in enumerate(zip(edge_sources, edge_targets))
+        if s in node_labels and t in node_labels
+    ]
+    if needs_merge or not kept:
+        final_df = _merge_context_frames(neighbour_nodes, list(zip(edge_sources, edge_types, edge_targets, provenances, evidences)))
+        combined_context = final_df["context"].str.cat(sep=" ")
+    else:
+        predicate_of = {edge_type: edge_type.split("_")[0] for edge_type in set(edge_types)}
+        sources = [node_labels[edge_sources[i]] for i in kept]
+        targets = [node_labels[edge_targets[i]] for i in kept]
+        kept_types = [edge_types[i] for i in kept]
+        predicates = [predicate_of[edge_type] for edge_type in kept_types]
+        contexts = [f"{s} {p.lower()} {t}." for s, p, t in zip(sources, predicates, targets)]
+        final_df = pd.DataFrame({
+            "source": sources,
+            "edge_type": kept_types,
+            "target": targets,
+            # dtype inferred over all edges, as when the merge starts from the full edge table
+            "provenance": pd.Series(provenances).take(kept).reset_index(drop=True),
+            "evidence": [evidences[i] for i in kept],
+            "predicate": predicates,
+            "context": contexts,
+        }, columns=CONTEXT_COLUMNS)
+        combined_context = " ".join(contexts)
+
+    combined_context += (
+        f" {node} has a {node_context[0]['data']['properties']['source']} "
+        f"identifier of {node_context[0]['data']['properties']['identifier']}."
+    )
+    return combined_context, final_df
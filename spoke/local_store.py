@@ -0,0 +1,311 @@
+"""
+Local SPOKE subgraph store - serves disease neighborhoods from an indexed SQLite file instead of the SPOKE API.
+
+The store holds the nodes and edges of imported neighborhoods (from the SPOKE cache filled by `spoke.prefetch`, or
+from exported neighborhood JSON files), with indexes on disease name and edge endpoints. A neighborhood query walks
+DEPTH hops from the disease node and returns the subgraph induced by the nodes reached, after applying the node/edge
+type filters and the CUTOFF_* values from config locally. The response has the API's JSON shape (queried disease
+first, edges in import order), so get_context returns what SpokeAPIClient.get_context returns for the same data.
+
+Cutoffs only drop entries that carry the property they test - exports were already filtered by SPOKE with the
+parameters they were fetched with, so import with the loosest cutoffs you plan to query with.
+
+Usage: python -m spoke.local_store --store_path <path> [--from_cache [<spoke_cache_path>]] [--from_files <json/jsonl> ...]
+"""
+import argparse
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from tqdm import tqdm
+
+from config.config import config_mini as config
+from utils.sqlite_cache import SQLiteCache
+from spoke.context_parser import parse_context
+
+_EXCLUDED_NODE_TYPES = ["DatabaseTimestamp", "Version"]
+
+# (property, comparison, cutoff parameter) per node / edge type - entries without the property pass
+_NODE_CUTOFFS = {
+    "Compound": [("max_phase", ">=", "cutoff_Compound_max_phase")],
+    "Protein": [("source", "in", "cutoff_Protein_source")],
+}
+_EDGE_CUTOFFS = {
+    "TREATS_CtD": [("phase", ">=", "cutoff_CtD_phase")],
+    "INTERACTS_PiP": [("confidence", ">=", "cutoff_PiP_confidence")],
+    "EXPRESSEDIN_ACTeG": [("level", "in", "cutoff_ACTeG_level")],
+    "PREVALENCE_DpL": [("average_prevalence", ">=", "cutoff_DpL_average_prevalence")],
+}
+# ASSOCIATES_DaG passes with an accepted source, or through textmining with a high enough score
+_DAG_SOURCES, _DAG_TEXTMINING_SCORE = "diseases_sources", "diseases_textmining_score"
+
+
+def _passes(properties, rules, params):
+    for prop, comparison, param in rules:
+        value = properties.get(prop)
+        if value is None:
+            continue
+        cutoff = params[param]
+        if comparison == ">=":
+            passed = float(value) >= cutoff
+        elif isinstance(value, list):
+            passed = any(v in cutoff for v in value)
+        else:
+            passed = value in cutoff
+        if not passed:
+            return False
+    return True
+
+
+def _dag_passes(properties, params):
+    sources = properties.get(_DAG_SOURCES)
+    if sources is None:
+        return True
+    sources = sources if isinstance(sources, list) else [sources]
+    if any(source in params["cutoff_DaG_diseases_sources"] for source in sources):
+        return True
+    score = properties.get(_DAG_TEXTMINING_SCORE)
+    return "textmining" in sources and score is not None and float(score) >= params["cutoff_DaG_textmining"]
+
+
+def node_passes(neo_type, properties, params):
+    """
+    Whether a node is kept by the node type filter and the node cutoffs in params (see get_context_params)
+    """
+    return neo_type in params["node_filters"] and _passes(properties, _NODE_CUTOFFS.get(neo_type, ()), params)
+
+
+def edge_passes(neo_type, properties, params):
+    """
+    Whether an edge is kept by the edge type filter and the edge cutoffs in params (see get_context_params)
+    """
+    if neo_type not in params["edge_filters"]:
+        return False
+    if neo_type == "ASSOCIATES_DaG":
+        return _dag_passes(properties, params)
+    return _passes(properties, _EDGE_CUTOFFS.get(neo_type, ()), params)
+
+
+class LocalSpokeStore:
+    """
+    Drop-in replacement for SpokeAPIClient in RAG (get_context, get_context_params, get_neighborhood), backed by a
+    local SQLite file - safe to query from several threads, each thread reads through its own connection
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or config.SPOKE_LOCAL_STORE_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "id INTEGER PRIMARY KEY, neo4j_type TEXT NOT NULL, name TEXT, properties TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS nodes_type_name ON nodes(neo4j_type, name);"
+            "CREATE TABLE IF NOT EXISTS edges ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, id INTEGER, source INTEGER NOT NULL, target INTEGER NOT NULL, "
+            "neo4j_type TEXT NOT NULL, properties TEXT NOT NULL, UNIQUE(source, target, neo4j_type));"
+            "CREATE INDEX IF NOT EXISTS edges_target ON edges(target);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        self.get_data_types()
+
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+
+    def import_neighborhood(self, node_context):
+        """
+        Input: List[dict] - neighborhood JSON as returned by the SPOKE API (or an export of it)
+        Nodes and edges already in the store are kept as they are
+        """
+        nodes, edges = [], []
+        for item in node_context:
+            data = item["data"]
+            neo_type = data["neo4j_type"]
+            properties = data.get("properties", {})
+            if "_" not in neo_type:
+                name = properties.get("name") if neo_type == "Disease" else None
+                nodes.append((data["id"], neo_type, name, json.dumps(properties, ensure_ascii=False)))
+            else:
+                edges.append((data.get("id"), data["source"], data["target"], neo_type, json.dumps(properties, ensure_ascii=False)))
+
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR IGNORE INTO nodes (id, neo4j_type, name, properties) VALUES (?, ?, ?, ?)", nodes)
+            conn.executemany("INSERT OR IGNORE INTO edges (id, source, target, neo4j_type, properties) VALUES (?, ?, ?, ?, ?)", edges)
+
+
+    def set_data_types(self, data_types):
+        """
+        Input: dict - /api/v1/types response, so the node/edge filters match the API's
+        """
+        self._conn().execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('types', ?)", (json.dumps(data_types),))
+        self.get_data_types()
+
+
+    def import_from_cache(self, cache_path=None):
+        """
+        Imports every neighborhood (and the /types response) in a SPOKE cache file - returns the number of neighborhoods
+        """
+        n_imported = 0
+        cache = SQLiteCache(cache_path or config.SPOKE_CACHE_PATH)
+        for value in tqdm(cache.values(), total=len(cache), desc="Importing SPOKE cache"):
+            if isinstance(value, dict) and "nodes" in value and "edges" in value:
+                self.set_data_types(value)
+            elif isinstance(value, list) and value and "data" in value[0]:
+                self.import_neighborhood(value)
+                n_imported += 1
+        return n_imported
+
+
+    def import_from_file(self, path):
+        """
+        Imports a JSON file holding one neighborhood, or a JSONL file with one neighborhood per line - returns the number of neighborhoods
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            if str(path).endswith(".jsonl"):
+                neighborhoods = (json.loads(line) for line in f if line.strip())
+            else:
+                neighborhoods = [json.load(f)]
+            n_imported = 0
+            for node_context in neighborhoods:
+                self.import_neighborhood(node_context)
+                n_imported += 1
+        return n_imported
+
+
+    def get_data_types(self):
+        """
+        Node and edge types - from the imported /types response, else the types present in the store
+        """
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'types'").fetchone()
+        if row is not None:
+            data_types = json.loads(row[0])
+            self.node_types, self.edge_types = list(data_types["nodes"].keys()), list(data_types["edges"].keys())
+        else:
+            self.node_types = [r[0] for r in conn.execute("SELECT DISTINCT neo4j_type FROM nodes ORDER BY neo4j_type")]
+            self.edge_types = [r[0] for r in conn.execute("SELECT DISTINCT neo4j_type FROM edges ORDER BY neo4j_type")]
+        return self.node_types, self.edge_types
+
+
+    def get_context_params(self):
+        """
+        Neighborhood query parameters - the same dict SpokeAPIClient sends, used here to filter locally
+        """
+        return {
+            'node_filters': [node_type for node_type in self.node_types if node_type not in _EXCLUDED_NODE_TYPES],
+            'edge_filters': self.edge_types,
+            'cutoff_Compound_max_phase': config.CUTOFF_COMPOUND_MAX_PHASE,
+            'cutoff_Protein_source': config.CUTOFF_PROTEIN_SOURCE,
+            'cutoff_DaG_diseases_sources': config.CUTOFF_DAG_DISEASE_SOURCES,
+            'cutoff_DaG_textmining': config.CUTOFF_DAG_TERMINATING,
+            'cutoff_CtD_phase': config.CUTOFF_CTD_PHASE,
+            'cutoff_PiP_confidence': config.CUTOFF_PIP_CONFIDENCE,
+            'cutoff_ACTeG_level': config.CUTOFF_ACTEG_LEVEL,
+            'cutoff_DpL_average_prevalence': config.CUTOFF_DPL_AVERAGE_PREVALENCE,
+            'depth': config.DEPTH
+        }
+
+
+    def _incident_edges(self, conn, node_ids):
+        placeholders = ",".join("?" * len(node_ids))
+        return conn.execute(
+            f"SELECT seq, id, source, target, neo4j_type, properties FROM edges WHERE source IN ({placeholders}) "
+            f"UNION SELECT seq, id, source, target, neo4j_type, properties FROM edges WHERE target IN ({placeholders})",
+            (*node_ids, *node_ids)
+        ).fetchall()
+
+
+    def _nodes(self, conn, node_ids):
+        placeholders = ",".join("?" * len(node_ids))
+        rows = conn.execute(f"SELECT id, neo4j_type, properties FROM nodes WHERE id IN ({placeholders})", tuple(node_ids)).fetchall()
+        return {node_id: (neo_type, json.loads(properties)) for node_id, neo_type, properties in rows}
+
+
+    def get_neighborhood(self, node):
+        """
+        Neighborhood JSON of a disease node in the SPOKE API format - raises LookupError if the node is not in the store
+        """
+        conn = self._conn()
+        params = self.get_context_params()
+        row = conn.execute("SELECT id, properties FROM nodes WHERE neo4j_type = 'Disease' AND name = ?", (node,)).fetchone()
+        if row is None:
+            raise LookupError(f"Disease {node} is not in the local SPOKE store {self.path}")
+        center_id = row[0]
+
+        kept_nodes = {center_id: ("Disease", json.loads(row[1]))}
+        edges = {}      # seq -> row, edges passing the edge filters seen so far
+        frontier = [center_id]
+        for _ in range(params["depth"]):
+            if not frontier:
+                break
+            new_ids = set()
+            for edge in self._incident_edges(conn, frontier):
+                seq, _, source, target, neo_type, properties = edge
+                if seq in edges:
+                    continue
+                if not edge_passes(neo_type, json.loads(properties), params):
+                    continue
+                edges[seq] = edge
+                new_ids.update(n for n in (source, target) if n not in kept_nodes)
+            candidates = self._nodes(conn, list(new_ids)) if new_ids else {}
+            frontier = []
+            for node_id, (neo_type, properties) in candidates.items():
+                if node_passes(neo_type, properties, params):
+                    kept_nodes[node_id] = (neo_type, properties)
+                    frontier.append(node_id)
+
+        # edges among the outermost nodes are not incident to an expanded node - complete the induced subgraph
+        if frontier:
+            for edge in self._incident_edges(conn, frontier):
+                if edge[0] not in edges and edge_passes(edge[4], json.loads(edge[5]), params):
+                    edges[edge[0]] = edge
+
+        node_context = [{"data": {"neo4j_type": neo_type, "id": node_id, "properties": properties}} for node_id, (neo_type, properties) in kept_nodes.items()]
+        for seq in sorted(edges):
+            _, edge_id, source, target, neo_type, properties = edges[seq]
+            if source in kept_nodes and target in kept_nodes:
+                node_context.append({"data": {"neo4j_type": neo_type, "id": edge_id, "source": source, "target": target, "properties": json.loads(properties)}})
+        return node_context
+
+
+    def get_context(self, node):
+        return parse_context(node, self.get_neighborhood(node))
+
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        return {
+            "diseases": conn.execute("SELECT COUNT(*) FROM nodes WHERE neo4j_type = 'Disease'").fetchone()[0],
+            "nodes": conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0],
+            "edges": conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local SPOKE subgraph store from cached or exported neighborhoods")
+    parser.add_argument("--store_path", type=str, default=config.SPOKE_LOCAL_STORE_PATH or "data/spoke_local.sqlite", help="Path to the store file (created if missing)")
+    parser.add_argument("--from_cache", type=str, nargs="?", const=config.SPOKE_CACHE_PATH, default=None, help="Import the SPOKE cache (default SPOKE_CACHE_PATH)")
+    parser.add_argument("--from_files", type=str, nargs="+", default=[], help="Neighborhood JSON files (one neighborhood) or JSONL files (one per line)")
+    args = parser.parse_args()
+
+    store = LocalSpokeStore(args.store_path)
+    n_imported = 0
+    if args.from_cache:
+        n_imported += store.import_from_cache(args.from_cache)
+    for path in tqdm(args.from_files, desc="Importing files"):
+        n_imported += store.import_from_file(path)
+    print(f"Imported {n_imported} neighborhoods into {args.store_path}: {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
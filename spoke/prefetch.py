@@ -0,0 +1,71 @@
+"""
+Bulk prefetch of SPOKE disease neighborhoods into the local SPOKE cache (SPOKE_CACHE_PATH).
+
+Nodes come from a file (one node name per line) or from a BiomixQA split, with the same node selection as RAG
+retrieval. Neighborhoods are fetched concurrently over the client's pooled session, nodes that are already cached
+are skipped. Afterwards retrieval runs - also with SPOKE_OFFLINE=true - are served from the cache.
+
+Usage: python -m spoke.prefetch (--nodes_file <path> | --split tf|mcq [--data_len N]) [--workers 8] [--refresh]
+"""
+import argparse
+import json
+
+from tqdm import tqdm
+
+from config.config import config_mini
+from spoke.spoke_api_client import SpokeAPIClient
+
+
+def _read_nodes(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _dataset_nodes(spoke_api_client, split, data_len):
+    """
+    Disease nodes RAG retrieval would query for the questions of a BiomixQA split
+    """
+    from llm.openai_client import OpenAIClient
+    from rag.rag import RAG
+    from utils.dataset_loader import managed_load_dataset
+
+    extraction_client = OpenAIClient(config=config_mini)
+    rag = RAG(extraction_client, spoke_api_client, config_mini.CONTEXT_VOLUME, config_mini.QUESTION_VS_CONTEXT_SIMILARITY_PERCENTILE_THRESHOLD, config_mini.QUESTION_VS_CONTEXT_MINIMUM_SIMILARITY)
+    questions = managed_load_dataset(data_len=data_len)[split]
+
+    nodes = []
+    for question in tqdm(questions, desc="Selecting nodes"):
+        nodes_found, _ = rag.find_nodes(question["prompt"])
+        nodes.extend(nodes_found)
+    return list(dict.fromkeys(nodes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch SPOKE neighborhoods into the local SPOKE cache")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--nodes_file", type=str, help="File with one disease node name per line")
+    source.add_argument("--split", choices=["mcq", "tf"], help="BiomixQA split - prefetch the nodes its questions retrieve")
+    parser.add_argument("--data_len", type=int, default=None, help="Number of questions with --split (default - all)")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent requests (default - SPOKE_PREFETCH_WORKERS)")
+    parser.add_argument("--refresh", action="store_true", help="Re-fetch nodes that are already cached")
+    parser.add_argument("--save_nodes", type=str, default=None, help="Write the selected node names to this file")
+    args = parser.parse_args()
+
+    spoke_api_client = SpokeAPIClient()
+    if args.nodes_file:
+        nodes = _read_nodes(args.nodes_file)
+    else:
+        nodes = _dataset_nodes(spoke_api_client, args.split, args.data_len)
+
+    if args.save_nodes:
+        with open(args.save_nodes, "w", encoding="utf-8") as f:
+            f.write("".join(node + "\n" for node in nodes))
+
+    summary = spoke_api_client.prefetch_neighborhoods(nodes, max_workers=args.workers, refresh=args.refresh)
+    print(f"{len(set(nodes))} nodes: {summary['fetched']} fetched, {summary['cached']} already cached, {len(summary['failed'])} failed")
+    if summary["failed"]:
+        print(json.dumps(summary["failed"], indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tqdm import tqdm
 from config.config import config_mini as config
-import ast
-import pandas as pd
+from utils.sqlite_cache import SQLiteCache, make_cache_key
+from spoke.context_parser import parse_context
 import logging
 import json
 
@@ -17,6 +21,30 @@ class SpokeAPIClient:
             file_handler.setFormatter(formatter)
             self.logger.addHandler(file_handler)
 
+        # one pooled keep-alive session for all calls - connection errors and 429/5xx are retried with exponential backoff
+        self.session = requests.Session()
+        retry = Retry(
+            total=config.SPOKE_MAX_RETRIES,
+            backoff_factor=config.SPOKE_RETRY_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            raise_on_status=False   # last error response goes through raise_for_status as before
+        )
+        adapter = HTTPAdapter(pool_connections=config.SPOKE_POOL_SIZE, pool_maxsize=config.SPOKE_POOL_SIZE, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # raw neighborhood responses, keyed by base url, endpoint and the full cutoff-parameter set
+        self.cache = SQLiteCache(
+            config.SPOKE_CACHE_PATH,
+            max_entries=config.SPOKE_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.SPOKE_CACHE_TTL_SECONDS
+        ) if config.SPOKE_CACHE_PATH else None
+        # offline: everything is served from the cache (expired entries included), missing entries raise LookupError
+        self.offline = config.SPOKE_OFFLINE
+        if self.offline and self.cache is None:
+            raise ValueError("SPOKE_OFFLINE requires SPOKE_CACHE_PATH - prefetch neighborhoods with `python -m spoke.prefetch` first")
+
         self.get_data_types()
 
 
@@ -40,7 +68,7 @@ class SpokeAPIClient:
     def _get(self, endpoint, params=None):
         url = self.base_url + endpoint
         try:
-            response = requests.get(url=url, params=params) if params else requests.get(url=url)
+            response = self.session.get(url=url, params=params) if params else self.session.get(url=url)
             response.raise_for_status()
             self._log_api_call(url, params, response=response)
             return response
@@ -49,20 +77,45 @@ class SpokeAPIClient:
             raise
 
 
+    def _cache_key(self, endpoint, params=None):
+        return make_cache_key({"base_url": self.base_url, "endpoint": endpoint, "params": params})
+
+
+    def _get_json(self, endpoint, params=None, refresh=False):
+        """
+        JSON response of a GET - served from the local cache when fresh (any age when offline), stored there after a fetch
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(endpoint, params)
+            if not refresh:
+                cached = self.cache.get(cache_key, ignore_ttl=self.offline)
+                if cached is not None:
+                    return cached
+        if self.offline:
+            raise LookupError(f"{endpoint} is not in the local SPOKE cache (SPOKE_OFFLINE is set)")
+
+        data = self._get(endpoint, params=params).json()
+        if cache_key is not None:
+            self.cache.set(cache_key, data)
+        return data
+
+
     def get_data_types(self):
-        endpoint = "/api/v1/types"
-        response = self._get(endpoint)
-        data_types = response.json()
+        data_types = self._get_json("/api/v1/types")
         self.node_types = list(data_types["nodes"].keys())
         self.edge_types = list(data_types["edges"].keys())
         return self.node_types, self.edge_types
 
 
-    def get_context(self, node):
+    def get_context_params(self):
+        """
+        Neighborhood query parameters - node/edge filters and all SPOKE cutoffs from config
+        """
         node_types_to_remove = ["DatabaseTimestamp", "Version"]
         filtered_node_types = [node_type for node_type in self.node_types if node_type not in node_types_to_remove]
 
-        api_params = {
+        return {
             'node_filters' : filtered_node_types,
             'edge_filters': self.edge_types,
             'cutoff_Compound_max_phase': config.CUTOFF_COMPOUND_MAX_PHASE,
@@ -76,107 +129,58 @@ class SpokeAPIClient:
             'depth' : config.DEPTH
         }
 
+
+    def _neighborhood_endpoint(self, node):
         node_type = "Disease"
         attribute = "name"
-        neighbour_end_point = f"/api/v1/neighborhood/{node_type}/{attribute}/{node}"
-        response = self._get(neighbour_end_point, params=api_params)
-        node_context = response.json()
-
-        return self._parse_context(node, node_context)
-    
-
-    def _parse_context(self, node, node_context):
-        neighbour_nodes = []
-        neighbour_edges = []
-
-        for item in node_context:
-            data = item["data"]
-            neo_type = data["neo4j_type"]
-
-            if "_" not in neo_type:
-                try:
-                    name = data["properties"]["description"] if neo_type == "Protein" else data["properties"]["name"]
-                except:
-                    name = data["properties"]["identifier"]
-                
-                neighbour_nodes.append((neo_type, data["id"], name))
-            
+        return f"/api/v1/neighborhood/{node_type}/{attribute}/{node}"
+
+
+    def get_neighborhood(self, node, refresh=False):
+        """
+        Raw neighborhood JSON of a disease node - served from the local cache when fresh, refresh forces a fetch
+        """
+        return self._get_json(self._neighborhood_endpoint(node), params=self.get_context_params(), refresh=refresh)
+
+
+    def prefetch_neighborhoods(self, nodes, max_workers=None, refresh=False):
+        """
+        Inputs:
+            nodes: iterable of disease node names (duplicates are fetched once)
+            max_workers: int - concurrent requests, default SPOKE_PREFETCH_WORKERS
+            refresh: bool - re-fetch nodes that are already cached
+        Fetches the neighborhoods concurrently into the local cache, so later runs can be served from it (e.g. SPOKE_OFFLINE)
+
+        Returns dict - {"fetched": int, "cached": int, "failed": {node: error}}
+        """
+        if self.cache is None:
+            raise ValueError("prefetching needs the local SPOKE cache - set SPOKE_CACHE_PATH")
+        nodes = list(dict.fromkeys(nodes))
+        api_params = self.get_context_params()
+
+        summary = {"fetched": 0, "cached": 0, "failed": {}}
+        to_fetch = []
+        for node in nodes:
+            if not refresh and self.cache.contains(self._cache_key(self._neighborhood_endpoint(node), api_params), ignore_ttl=self.offline):
+                summary["cached"] += 1
             else:
-                provenance = self._extract_provenance(data["properties"])
-                evidence = data.get("properties", None)
-                neighbour_edges.append((data["source"], neo_type, data["target"], provenance, evidence))
-
-        nodes_df = pd.DataFrame(neighbour_nodes, columns=["node_type", "node_id", "node_name"])
-        edges_df = pd.DataFrame(neighbour_edges, columns=["source", "edge_type", "target", "provenance", "evidence"])
+                to_fetch.append(node)
 
-        return self._generate_context_and_merged_data(nodes_df, edges_df, node, node_context)
-
-
-    def _extract_provenance(self, props):
-        try:
-            return ", ".join(props["sources"])
-        except:
-            try:
-                source = props["source"]
-                return ", ".join(source) if isinstance(source, list) else source
-            except:
+        with ThreadPoolExecutor(max_workers=max_workers or config.SPOKE_PREFETCH_WORKERS) as executor:
+            futures = {executor.submit(self.get_neighborhood, node, True): node for node in to_fetch}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Prefetching SPOKE neighborhoods"):
                 try:
-                    preprint_list = ast.literal_eval(props.get("preprint_list", "[]"))
-                    if preprint_list:
-                        return ", ".join(preprint_list)
-                    pmid_list = ast.literal_eval(props.get("pmid_list", "[]"))
-                    pmid_list = list(map(lambda x: "pubmedId:" + x, pmid_list))
-                    return ", ".join(pmid_list) if pmid_list else "Based on data from Institute For Systems Biology (ISB)"
-                except:
-                    return "SPOKE-KG"
-    
-
-    def _generate_context_and_merged_data(self, nodes_df, edges_df, node_value, node_context):
-        merged_with_source = pd.merge(
-            edges_df, 
-            nodes_df, 
-            left_on="source", 
-            right_on="node_id"
-        ).drop("node_id", axis=1)
-
-        merged_with_source["source_name"] = (
-            merged_with_source["node_type"] + " " + merged_with_source["node_name"]
-        )
-        merged_with_source.drop(["source", "node_type", "node_name"], axis=1, inplace=True)
-        merged_with_source.rename(columns={"source_name": "source"}, inplace=True)
-
-        merged_with_target = pd.merge(
-            merged_with_source, 
-            nodes_df, 
-            left_on="target", 
-            right_on="node_id"
-        ).drop("node_id", axis=1)
-
-        merged_with_target["target_name"] = (
-            merged_with_target["node_type"] + " " + merged_with_target["node_name"]
-        )
-        merged_with_target.drop(["target", "node_type", "node_name"], axis=1, inplace=True)
-        merged_with_target.rename(columns={"target_name": "target"}, inplace=True)
-
-        final_merged_df = merged_with_target[
-            ["source", "edge_type", "target", "provenance", "evidence"]
-        ].copy()
+                    future.result()
+                    summary["fetched"] += 1
+                except Exception as e:
+                    summary["failed"][futures[future]] = str(e)
+        return summary
 
-        final_merged_df.loc[:, "predicate"] = final_merged_df["edge_type"].apply(
-            lambda x: x.split("_")[0]
-        )
-
-        final_merged_df.loc[:, "context"] = (
-            final_merged_df["source"] + " " +
-            final_merged_df["predicate"].str.lower() + " " +
-            final_merged_df["target"] + "."
-        )
 
-        combined_context = final_merged_df["context"].str.cat(sep=" ")
-
-        combined_context += (
-            f" {node_value} has a {node_context[0]['data']['properties']['source']} "
-            f"identifier of {node_context[0]['data']['properties']['identifier']}."
-        )
+    def get_context(self, node):
+        node_context = self.get_neighborhood(node)
+        return self._parse_context(node, node_context)
+    
 
-        return combined_context, final_merged_df
+    def _parse_context(self, node, node_context):
+        return parse_context(node, node_context)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+def make_cache_key(payload) -> str:
+    """
+    Content address for a JSON-serializable payload (dict keys are sorted, so order does not matter)
+    """
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class SQLiteCache:
+    """
+    Persistent key -> JSON value store in a single SQLite file, safe to share between threads.
+
+    max_entries - least recently used entries are evicted beyond this size (0 or less - unbounded)
+    ttl_seconds - entries older than this are treated as missing (None - never expire)
+    """
+
+    def __init__(self, path, max_entries=0, ttl_seconds=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache(last_access)")
+        # upper bound of the entry count (replacing a key counts as an insert) - entries are counted only once it passes max_entries
+        self._n_entries_bound = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] if max_entries > 0 else 0
+
+    def get(self, key, ignore_ttl=False):
+        """
+        Returns the cached value, or None on a miss (or an expired entry unless ignore_ttl)
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (not ignore_ttl and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def contains(self, key, ignore_ttl=False):
+        """
+        Whether a (fresh, unless ignore_ttl) entry exists - does not load the value or count as a hit/miss
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        return ignore_ttl or self.ttl_seconds is None or time.time() - row[0] <= self.ttl_seconds
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            if self.max_entries > 0:
+                self._n_entries_bound += 1
+                if self._n_entries_bound > self.max_entries:
+                    # evict in chunks (~10% of the bound) so a full cache does not pay a DELETE on every insert
+                    n_entries = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+                    if n_entries > self.max_entries:
+                        n_evict = n_entries - self.max_entries + self.max_entries // 10
+                        self._conn.execute(
+                            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_access LIMIT ?)", (n_evict,)
+                        )
+                        n_entries -= n_evict
+                    self._n_entries_bound = n_entries
+
+    def values(self, batch_size=100):
+        """
+        Yields all stored values (expired ones included) - read in batches, e.g. to export the cache
+        """
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, value FROM cache WHERE rowid > ? ORDER BY rowid LIMIT ?", (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, value in rows:
+                yield json.loads(value)
+            last_rowid = rows[-1][0]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
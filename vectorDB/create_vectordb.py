@@ -1,8 +1,29 @@
+"""
+Disease node vector DB build.
+
+Chunks are embedded in worker processes (one sentence-transformer per process, `workers` batches in flight) and
+written to Chroma with their precomputed embeddings. The build is incremental: every chunk's id is a hash of its
+content, so only chunks not yet in the DB are embedded (new or changed disease texts, or the rest of an interrupted
+build), identical chunks are stored once and chunks that no longer occur are deleted once the new ones are stored.
+A manifest next to the DB records the embedding model and splitter parameters - when they differ from config, the DB
+is rebuilt - and whether the last build finished. A finished build also records the size and modification time of
+the data file, so a rerun on unchanged data returns without loading or splitting it.
+
+Usage: python -m vectorDB.create_vectordb [--workers 4] [--embed_batch_size 512]
+"""
+import argparse
+import json
+import multiprocessing
+import os
 import pickle
+import time
+from itertools import islice
+
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from config.config import config_mini
+from utils.sqlite_cache import make_cache_key
 from tqdm import tqdm
 
 data_path = config_mini.VECTOR_DB_DISEASE_ENTITY_PATH
@@ -11,6 +32,10 @@ chunk_size = config_mini.VECTOR_DB_CHUNK_SIZE
 chunk_overlap = config_mini.VECTOR_DB_CHUNK_OVERLAP
 batch_size = config_mini.VECTOR_DB_BATCH_SIZE
 sentence_embedding_model = config_mini.VECTOR_DB_SENTENCE_EMBEDDING_MODEL
+manifest_path = os.path.join(vector_db_name, "index_manifest.json")
+
+_embedding_function = None  # per worker process, set by _init_worker
+
 
 def load_data():
     with open(data_path, "rb") as f:
@@ -19,35 +44,155 @@ def load_data():
     return data, metadata_list
 
 
-def create_vector_db_no_batching():
+def split_documents():
     data, metadata_list = load_data()
     print(f"Loaded {len(data)} data points")
-    
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    docs = text_splitter.create_documents(data, metadatas=metadata_list)
+    return text_splitter.create_documents(data, metadatas=metadata_list)
 
-    print("Initializing Chroma VectorDB with HuggingFaceEmbeddings...")
-    vector_store = Chroma(embedding_function=HuggingFaceEmbeddings(model_name=sentence_embedding_model), persist_directory=vector_db_name)
-    
-    for doc in tqdm(docs, desc="Adding documents to VectorDB", unit="doc"):
-        vector_store.add_documents(documents=[doc])
 
-    print("VectorDB created successfully!")
+def _chunk_id(doc):
+    """
+    Content-hash id - the same chunk text and metadata always get the same id
+    """
+    return make_cache_key({"text": doc.page_content, "metadata": doc.metadata})
 
 
-def create_vector_db():
-    data, metadata_list = load_data()
-    print(f"Loaded {len(data)} data points")
-    
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    docs = text_splitter.create_documents(data, metadatas=metadata_list)
-    batches = [docs[i:i + batch_size] for i in range(0, len(docs), batch_size)]
+def _index_manifest():
+    return {"model": sentence_embedding_model, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+
+def _load_manifest():
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _data_fingerprint():
+    stat = os.stat(data_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _save_manifest(complete, data=None):
+    """
+    complete: bool - False while chunks are being stored, True once the DB matches the data
+    data: dict - _data_fingerprint() of the data the DB was built from, recorded when complete
+    """
+    manifest = {**_index_manifest(), "complete": complete}
+    if complete:
+        manifest["data"] = data
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, manifest_path)
+
+
+def _init_worker(model_name, n_threads=None):
+    """
+    Runs once per worker process - loads the sentence-transformer
+    n_threads: int - torch threads of this worker (None - torch default, all cores)
+    """
+    global _embedding_function
+    if n_threads:
+        os.environ["OMP_NUM_THREADS"] = str(n_threads)
+    _embedding_function = HuggingFaceEmbeddings(model_name=model_name)
+    if n_threads:
+        import torch  # loaded by the sentence-transformer already
+        torch.set_num_threads(n_threads)
+
+
+def _embed_batch(texts):
+    return _embedding_function.embed_documents(texts)
+
+
+def _embed_batches(text_batches, workers):
+    """
+    Input: text_batches - iterable of List[str], consumed lazily
+    Yields the embeddings of each batch in input order - computed in a process pool if workers > 1
+    """
+    if workers <= 1:
+        _init_worker(sentence_embedding_model)
+        for texts in text_batches:
+            yield _embed_batch(texts)
+        return
+
+    # split the cores between the workers instead of every worker's torch using all of them
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    text_batches = iter(text_batches)
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=workers, initializer=_init_worker, initargs=(sentence_embedding_model, n_threads)) as pool:
+        # bounded windows, so finished embeddings are written out before more texts are queued
+        while window := list(islice(text_batches, workers * 4)):
+            yield from pool.imap(_embed_batch, window)
+
+
+def create_vector_db(workers=None, embed_batch_size=None):
+    """
+    Inputs:
+        workers: int - embedding processes, default VECTOR_DB_WORKERS (1 - embed in this process)
+        embed_batch_size: int - chunks per embedding task and per write, default VECTOR_DB_BATCH_SIZE
+    Builds or updates the vector DB at VECTOR_DB_PATH - embeds chunks not in it yet, deletes chunks no longer in the data
+    """
+    workers = workers or config_mini.VECTOR_DB_WORKERS
+    embed_batch_size = embed_batch_size or batch_size
+    # taken before loading, so data changed during the build is picked up by the next run
+    data_fingerprint = _data_fingerprint()
+    if _load_manifest() == {**_index_manifest(), "complete": True, "data": data_fingerprint}:
+        print("VectorDB is up to date.")
+        return
+
+    docs_by_id = {}
+    for doc in split_documents():
+        docs_by_id.setdefault(_chunk_id(doc), doc)
+
+    # embeddings are passed in precomputed, the store itself never embeds - ids are listed, upserted with their
+    # embeddings and deleted on the underlying chromadb collection, langchain's Chroma wraps none of these
+    vector_store = Chroma(embedding_function=None, persist_directory=vector_db_name)
+    existing_ids = set(vector_store._collection.get(include=[])["ids"])
+    manifest = _load_manifest() or {}
+    if existing_ids and {key: manifest.get(key) for key in _index_manifest()} != _index_manifest():
+        print(f"VectorDB at {vector_db_name} was built with other parameters ({manifest or None}) - rebuilding.")
+        vector_store.delete_collection()
+        vector_store = Chroma(embedding_function=None, persist_directory=vector_db_name)
+        existing_ids = set()
+    # the parameters are recorded before anything is stored, so an interrupted build is resumed instead of rebuilt
+    _save_manifest(complete=False)
+    collection = vector_store._collection
+
+    todo = [chunk_id for chunk_id in docs_by_id if chunk_id not in existing_ids]
+    stale = [chunk_id for chunk_id in existing_ids if chunk_id not in docs_by_id]
+    print(f"{len(docs_by_id)} unique chunks: {len(docs_by_id) - len(todo)} already in the VectorDB, {len(todo)} to embed with {workers} worker(s), {len(stale)} to delete")
+    if todo:
+        id_batches = [todo[i:i + embed_batch_size] for i in range(0, len(todo), embed_batch_size)]
+        text_batches = ([docs_by_id[chunk_id].page_content for chunk_id in ids] for ids in id_batches)
+
+        start_time = time.time()
+        progress = tqdm(total=len(todo), desc="Adding documents to VectorDB", unit="doc")
+        for ids, embeddings in zip(id_batches, _embed_batches(text_batches, workers)):
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=[docs_by_id[chunk_id].page_content for chunk_id in ids],
+                metadatas=[docs_by_id[chunk_id].metadata for chunk_id in ids]
+            )
+            progress.update(len(ids))
+        progress.close()
+        elapsed = time.time() - start_time
 
-    print("Initializing Chroma VectorDB with HuggingFaceEmbeddings...")
-    vector_store = Chroma(embedding_function=HuggingFaceEmbeddings(model_name=sentence_embedding_model), persist_directory=vector_db_name)
-    
-    for batch in tqdm(batches, desc="Adding documents to VectorDB", unit="batch"):
-        vector_store.add_documents(documents=batch)
+    # stale chunks go only after their replacements are stored - an interrupted update never loses data
+    for i in range(0, len(stale), embed_batch_size):
+        collection.delete(ids=stale[i:i + embed_batch_size])
+    _save_manifest(complete=True, data=data_fingerprint)
 
-    print("VectorDB created successfully!")
+    if todo:
+        print(f"VectorDB updated successfully! {len(todo)} chunks in {elapsed:.2f} seconds ({len(todo) / max(elapsed, 1e-9):.1f} docs/sec)")
+    else:
+        print("VectorDB is up to date.")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or incrementally update the disease node vector DB")
+    parser.add_argument("--workers", type=int, default=None, help="Embedding processes (default - VECTOR_DB_WORKERS)")
+    parser.add_argument("--embed_batch_size", type=int, default=None, help="Chunks per embedding task (default - VECTOR_DB_BATCH_SIZE)")
+    args = parser.parse_args()
+    create_vector_db(args.workers, args.embed_batch_size)